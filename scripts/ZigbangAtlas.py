@@ -0,0 +1,89 @@
+#------------------------------------
+# Texture atlas for frame materials. No bpy here, the exporter reads and
+# writes the pixels (atlas_frame in ZigbangExporter.py).
+#
+#   ... ZigbangExporter.py -- --atlas
+#
+# Frame pieces whose UVs fit into one repeat of their texture move to a
+# shared atlas material : one color atlas, plus one normal atlas when any of
+# the materials has a normal map. Repeats are whole numbers, so a piece with
+# uvs in 7.2 .. 8.0 is shifted to 0.2 .. 1.0 and samples the same texels.
+# Tiled pieces (most walls, large floors) keep their own material.
+#
+# Tiles are shelf packed tallest first with an edge padding against
+# bleeding, and halved until the atlas fits into MAX_SIZE.
+
+import math
+
+import numpy as np
+
+MAX_SIZE = 4096
+PADDING = 8
+
+def fit_offset(loop_uvs, eps=1e-4):
+    # whole number shift that moves every uv into [0, 1], None for tiled uvs
+    low = np.floor(loop_uvs.min(axis=0) + eps)
+    if np.any(loop_uvs.max(axis=0) - low > 1 + eps):
+        return None
+    return -low
+
+def next_power_of_two(n):
+    return 1 << max(0, int(math.ceil(n)) - 1).bit_length()
+
+#------------------------------------
+# Layout. sizes are (width, height) in pixels, positions the lower left
+# corner of the padded tile.
+def pack(sizes, padding=PADDING):
+    padded = [(w + 2 * padding, h + 2 * padding) for w, h in sizes]
+    area = sum(w * h for w, h in padded)
+    width = next_power_of_two(max(max(w for w, h in padded), math.sqrt(area)))
+
+    positions = [None] * len(sizes)
+    x = y = shelf = 0
+    for i in sorted(range(len(sizes)), key=lambda i: (-padded[i][1], -padded[i][0])):
+        w, h = padded[i]
+        if x + w > width:
+            x, y, shelf = 0, y + shelf, 0
+        positions[i] = (x, y)
+        x += w
+        shelf = max(shelf, h)
+    return positions, (width, next_power_of_two(y + shelf))
+
+def layout(sizes, max_size=MAX_SIZE, padding=PADDING):
+    scale = 1
+    while True:
+        scaled = [(max(1, w // scale), max(1, h // scale)) for w, h in sizes]
+        positions, size = pack(scaled, padding)
+        if max(size) <= max_size or all(s == (1, 1) for s in scaled):
+            return scaled, positions, size
+        scale *= 2
+
+#------------------------------------
+# Pixels. Arrays are (height, width, channels), row 0 at the bottom like
+# blender image pixels and uv v = 0.
+def resize(pixels, width, height):
+    # bilinear, sampled at pixel centers
+    h, w = pixels.shape[:2]
+    if (w, h) == (width, height):
+        return pixels
+    ys = np.clip((np.arange(height) + 0.5) * h / height - 0.5, 0, h - 1)
+    xs = np.clip((np.arange(width) + 0.5) * w / width - 0.5, 0, w - 1)
+    y0, x0 = np.floor(ys).astype(np.int64), np.floor(xs).astype(np.int64)
+    y1, x1 = np.minimum(y0 + 1, h - 1), np.minimum(x0 + 1, w - 1)
+    fy, fx = (ys - y0)[:, None, None], (xs - x0)[None, :, None]
+    top = pixels[y0][:, x0] * (1 - fx) + pixels[y0][:, x1] * fx
+    bottom = pixels[y1][:, x0] * (1 - fx) + pixels[y1][:, x1] * fx
+    return (top * (1 - fy) + bottom * fy).astype(pixels.dtype)
+
+def compose(tiles, positions, size, padding=PADDING):
+    atlas = np.zeros((size[1], size[0], tiles[0].shape[2]), dtype=np.float32)
+    for tile, (x, y) in zip(tiles, positions):
+        h, w = tile.shape[:2]
+        atlas[y:y + h + 2 * padding, x:x + w + 2 * padding] = np.pad(tile, ((padding, padding), (padding, padding), (0, 0)), mode='edge')
+    return atlas
+
+def remap(loop_uvs, offset, position, tile_size, atlas_size, padding=PADDING):
+    uvs = loop_uvs + offset
+    x, y = position
+    return np.column_stack([(x + padding + uvs[:, 0] * tile_size[0]) / atlas_size[0],
+                            (y + padding + uvs[:, 1] * tile_size[1]) / atlas_size[1]])
@@ -0,0 +1,253 @@
+#------------------------------------
+# Batch driver. Runs ZigbangExporter.py in N background blender workers.
+#
+#   python scripts/ZigbangBatch.py --blender <blender 설치 경로> --workers 8 [inputs ...]
+#
+# Inputs are sharded into small jobs, every job is its own blender process,
+# so a crash or a hang only costs the files of that job. Files that did not
+# finish are retried one file per process. With --bounded a worker that
+# outgrows --memory-ceiling hands back its remaining files ("recycle"), they
+# run in a new process without using up a retry.
+#
+# --direct skips blender and runs ZigbangGLTF.py in a process pool
+# (room shell + furniture asset nodes). Timeouts only apply to blender jobs.
+#
+# --manifest takes the inputs from a ZigbangPreflight.py manifest : valid
+# inputs largest first, invalid ones fail without starting blender.
+
+import argparse
+import glob
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+import ZigbangBinary
+import ZigbangConfig
+import ZigbangCache
+import ZigbangGLTF
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+exporter_path = os.path.join(root_path, "scripts", "ZigbangExporter.py")
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="ZigbangBatch")
+    parser.add_argument("inputs", nargs="*", help="floorplan .json or .zfp files. default: inputs/*.json")
+    parser.add_argument("--blender", default=os.environ.get("BLENDER", "/Applications/Blender.app/Contents/MacOS/Blender"))
+    parser.add_argument("--workspace", default=os.path.join(root_path, "workspace.blend"))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk", type=int, default=0, help="files per blender process. default: automatic")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds allowed per file")
+    parser.add_argument("--retries", type=int, default=1, help="extra attempts for failed files")
+    parser.add_argument("--log-dir", default=os.path.join(root_path, "assets", "logs"))
+    parser.add_argument("--manifest", help="job manifest of ZigbangPreflight.py instead of inputs")
+    parser.add_argument("--force", action="store_true", help="ignore the export manifest and export everything")
+    parser.add_argument("--direct", action="store_true", help="write glTF with ZigbangGLTF.py instead of blender")
+    parser.add_argument("--glb", action="store_true", help="with --direct, write .glb files")
+    parser.add_argument("--quality", choices=list(ZigbangConfig.TEXTURE_TIERS), default="full", help="texture tier")
+    parser.add_argument("--lods", type=int, default=0, help="furniture LOD files per room, blender only")
+    parser.add_argument("--merge-frame", action="store_true", help="one frame mesh per material")
+    parser.add_argument("--atlas", action="store_true", help="frame texture atlas, blender only")
+    parser.add_argument("--render", choices=list(ZigbangConfig.RENDER_PRESETS), help="thumbnails per room, blender only")
+    parser.add_argument("--bounded", action="store_true", help="bounded memory workers, see ZigbangExporter.py --bounded")
+    parser.add_argument("--memory-ceiling", type=float, help="MB per blender worker. default: ZigbangConfig.MEMORY_CEILING_MB")
+    parser.add_argument("--trace", action="store_true", help="stage timings per job in the log dir (<job>.trace.jsonl / .trace.json)")
+    parser.add_argument("--profile", choices=list(ZigbangConfig.load_profiles()), default=ZigbangConfig.DEFAULT_PROFILE,
+                        help="draco settings, blender only")
+    return parser.parse_args()
+
+def read_manifest(manifest_path):
+    with open(manifest_path, 'r') as file:
+        manifest = json.load(file)
+    file_names = [job["input"] for job in manifest["jobs"]]
+    invalid = {r["input"]: {"input": r["input"], "status": "failed", "attempts": 0,
+                            "error": "preflight: {}".format("; ".join(r["errors"]))} for r in manifest["invalid"]}
+    return file_names, invalid
+
+def shard(file_names, size):
+    return [file_names[i:i + size] for i in range(0, len(file_names), size)]
+
+def read_status(status_path):
+    results = {}
+    if os.path.exists(status_path):
+        with open(status_path, 'r') as file:
+            for line in file:
+                line = line.strip()
+                if line:
+                    result = json.loads(line)
+                    results[result["input"]] = result
+    return results
+
+#------------------------------------
+# One job = one blender process over a few files
+def run_job(args, job_name, file_names):
+    fd, status_path = tempfile.mkstemp(prefix="zigbang_", suffix=".jsonl")
+    os.close(fd)
+
+    command = [args.blender, "--background", args.workspace,
+               "--python", exporter_path, "--",
+               "--status", status_path, "--quality", args.quality, "--lods", str(args.lods), "--profile", args.profile] + file_names
+    if args.merge_frame:
+        command.append("--merge-frame")
+    if args.atlas:
+        command.append("--atlas")
+    if args.render:
+        command += ["--render", args.render]
+    if args.trace:
+        command += ["--trace", os.path.join(args.log_dir, "{}.trace.jsonl".format(job_name)),
+                    "--chrome-trace", os.path.join(args.log_dir, "{}.trace.json".format(job_name))]
+    if args.bounded:
+        command.append("--bounded")
+    if args.memory_ceiling is not None:
+        command += ["--memory-ceiling", str(args.memory_ceiling)]
+    if args.force:
+        command.append("--force")
+    timeout = args.timeout * len(file_names)
+
+    start = time.time()
+    with open(os.path.join(args.log_dir, "{}.log".format(job_name)), 'w') as log:
+        try:
+            process = subprocess.run(command, stdout=log, stderr=subprocess.STDOUT, timeout=timeout)
+            reason = "blender exited with code {}".format(process.returncode)
+        except subprocess.TimeoutExpired:
+            reason = "timeout after {}s".format(timeout)
+        except OSError as e:
+            reason = "could not start blender: {}".format(e)
+
+    results = read_status(status_path)
+    os.remove(status_path)
+
+    # files without a status line were lost with the process
+    for file_name in file_names:
+        if file_name not in results:
+            results[file_name] = {"input": file_name, "status": "failed", "error": reason}
+
+    return results, time.time() - start
+
+#------------------------------------
+# Unchanged rooms never start a blender process
+def split_current(args, file_names):
+    blend_path = os.path.dirname(os.path.abspath(args.workspace))
+    source_path = os.path.join(blend_path, "source", "source.blend")
+
+    pending = []
+    skipped = {}
+    options = ZigbangConfig.export_options(args.quality, args.lods, args.merge_frame, args.profile, args.render, args.atlas)
+    for file_name in file_names:
+        if args.force:
+            pending.append(file_name)
+            continue
+        if args.direct:
+            # the direct key covers the materials and furniture assets the room uses
+            try:
+                key = ZigbangGLTF.room_key(file_name, ZigbangBinary.load(file_name), args.glb, args.quality, args.merge_frame, blend_path)
+            except Exception:
+                pending.append(file_name)
+                continue
+        else:
+            key = ZigbangCache.cache_key(file_name, source_path, options)
+        if ZigbangCache.is_current(blend_path, file_name, key):
+            skipped[file_name] = {"input": file_name, "status": "skipped", "attempts": 0}
+        else:
+            pending.append(file_name)
+
+    return pending, skipped
+
+#------------------------------------
+# --direct : one process pool, a job is a list of files for ZigbangGLTF
+def run_direct_job(args, executor, file_names):
+    start = time.time()
+    try:
+        results = executor.submit(ZigbangGLTF.export_files, file_names, args.glb, True, args.quality, args.merge_frame).result()
+    except Exception as e:
+        # a worker that died takes its files with it
+        results = {f: {"input": f, "status": "failed", "error": "{}: {}".format(type(e).__name__, e)} for f in file_names}
+    return results, time.time() - start
+
+def run(args, file_names):
+    attempts = {}
+    pending, results = split_current(args, file_names)
+
+    chunk = args.chunk or max(1, min(8, math.ceil(len(file_names) / (args.workers * 4))))
+
+    rounds = 0
+    while pending:
+        # first attempts amortize blender start up, retries isolate every file
+        retrying = any(attempts.get(f, 0) > 0 for f in pending)
+        jobs = shard(pending, 1 if retrying else chunk)
+        with ThreadPoolExecutor(max_workers=args.workers) as executor, \
+             ProcessPoolExecutor(max_workers=args.workers) as pool:
+            if args.direct:
+                futures = [executor.submit(run_direct_job, args, pool, job) for job in jobs]
+            else:
+                futures = [executor.submit(run_job, args, "job_{}_{}".format(rounds, i), job)
+                           for i, job in enumerate(jobs)]
+            for future in as_completed(futures):
+                job_results, seconds = future.result()
+                for file_name, result in job_results.items():
+                    # recycled files never ran, that is no attempt
+                    if result["status"] != "recycle":
+                        attempts[file_name] = attempts.get(file_name, 0) + 1
+                    result["attempts"] = attempts.get(file_name, 0)
+                    results[file_name] = result
+                    print("[{}] {} {}".format(result["status"], os.path.basename(file_name), result.get("error", "")))
+        rounds += 1
+
+        # the retry budget is per file, recycled rounds do not use it up
+        failed = [f for f in pending if results[f]["status"] == "failed" and attempts[f] <= args.retries]
+        pending = [f for f in pending if results[f]["status"] == "recycle"] + failed
+
+    return results
+
+#------------------------------------
+# Summary
+def summarize(results, seconds, summary_path):
+    ok = [r for r in results.values() if r["status"] == "ok"]
+    skipped = [r for r in results.values() if r["status"] == "skipped"]
+    failed = [r for r in results.values() if r["status"] == "failed"]
+    summary = {
+        "total": len(results),
+        "ok": len(ok),
+        "skipped": len(skipped),
+        "failed": len(failed),
+        "retried": len([r for r in results.values() if r["attempts"] > 1]),
+        "seconds": round(seconds, 3),
+        "failures": failed,
+    }
+    with open(summary_path, 'w') as file:
+        json.dump(summary, file, indent=2)
+
+    print("------------------------------------")
+    print("total {}  ok {}  skipped {}  failed {}  retried {}  {:.1f}s".format(
+        summary["total"], summary["ok"], summary["skipped"], summary["failed"], summary["retried"], seconds))
+    for r in failed:
+        print("  {} : {}".format(r["input"], r.get("error", "")))
+    print("summary : {}".format(summary_path))
+
+    return summary
+
+def main():
+    args = parse_args()
+
+    invalid = {}
+    if args.manifest:
+        file_names, invalid = read_manifest(args.manifest)
+    else:
+        file_names = args.inputs or glob.glob(os.path.join(root_path, "inputs", "*.json"))
+    file_names = [os.path.abspath(f) for f in file_names]
+    if not os.path.exists(args.log_dir):
+        os.makedirs(args.log_dir)
+
+    start = time.time()
+    results = run(args, file_names)
+    results.update(invalid)
+    summary = summarize(results, time.time() - start, os.path.join(args.log_dir, "summary.json"))
+
+    return 1 if summary["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,342 @@
+#------------------------------------
+# Geometry benchmarks under plain CPython, no blender needed.
+#
+#   python scripts/ZigbangBenchmark.py                       inputs/ + inputs/temp/
+#   python scripts/ZigbangBenchmark.py --save base.json      keep the timings
+#   python scripts/ZigbangBenchmark.py --compare base.json   exit 1 on a slower stage
+#   python scripts/ZigbangBenchmark.py --profile             cProfile of one pass
+#   python scripts/ZigbangBenchmark.py --profiles [names]    export profiles through blender
+#   python scripts/ZigbangBenchmark.py --scaling vertices    synthetic plans of growing size
+#
+# Every stage runs the same ZigbangGeometry code the exporter runs inside
+# blender; only the bpy calls (mesh fill, export) are left out.
+#
+# --profiles exports the inputs once per profile of config/export_profiles.json
+# into a scratch folder and reports encode time (the export stage of the
+# exporter trace, no blender start up or room building), glTF + bin size
+# and the time to decode the geometry again. An untimed first pass warms the
+# texture cache. Draco decoding needs the optional DracoPy package.
+#
+# --scaling grows one of rooms / furniture / vertices of a ZigbangSynth plan
+# over --sizes, keeps the others at --rooms / --furniture / --vertices, and
+# prints every stage per size with its growth exponent (the log log slope of
+# ms against size, 1 = linear). Stages above --superlinear are flagged and
+# make the run exit 1.
+
+import argparse
+import cProfile
+import glob
+import json
+import os
+import pstats
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import ZigbangBinary
+import ZigbangConfig
+import ZigbangGeometry
+import ZigbangSynth
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+exporter_path = os.path.join(root_path, "scripts", "ZigbangExporter.py")
+
+#------------------------------------
+# Stages
+def stage_load(file_name, floorplan):
+    return ZigbangBinary.load(file_name)
+
+def stage_furniture(file_name, floorplan):
+    return [ZigbangGeometry.furniture_placement(f) for f in floorplan["Furnitures"]]
+
+def stage_arrays(file_name, floorplan):
+    pieces = []
+    for data in floorplan["WallAndFloors"]:
+        co = ZigbangGeometry.to_array(data["vertices"], ("x", "y", "z"))
+        uvs = ZigbangGeometry.to_array(data["uv"], ("x", "y"))
+        triangles = ZigbangGeometry.to_triangles(data["triangles"])
+        pieces.append((data["name"], co, triangles, uvs))
+    return pieces
+
+def stage_uv(file_name, pieces):
+    return [ZigbangGeometry.frame_uvs(name, co, triangles, uvs) for name, co, triangles, uvs in pieces]
+
+def stage_solidify(file_name, pieces):
+    solids = []
+    for name, co, triangles, uvs in pieces:
+        offset, thickness = ZigbangGeometry.frame_offset(name)
+        if thickness is not None and len(triangles):
+            solids.append(ZigbangGeometry.solidify(co, triangles, thickness))
+    return solids
+
+def stage_optimize(file_name, pieces):
+    return [ZigbangGeometry.optimize_mesh(co, triangles) for name, co, triangles, uvs in pieces if len(triangles)]
+
+def stage_transform(file_name, pieces):
+    moved = []
+    for name, co, triangles, uvs in pieces:
+        offset, thickness = ZigbangGeometry.frame_offset(name)
+        moved.append(co + (0, offset, 0))
+
+    mins = np.min([ZigbangGeometry.bounds(co)[0] for co in moved if len(co)], axis=0)
+    maxs = np.max([ZigbangGeometry.bounds(co)[1] for co in moved if len(co)], axis=0)
+    matrix = ZigbangGeometry.Y_UP_ROTATION @ ZigbangGeometry.translation(ZigbangGeometry.center_offset(mins, maxs))
+    return [ZigbangGeometry.transform_points(matrix, co) for co in moved]
+
+def run_once(file_name, timings):
+    def timed(name, function, value):
+        start = time.perf_counter()
+        result = function(file_name, value)
+        timings.setdefault(name, []).append(time.perf_counter() - start)
+        return result
+
+    floorplan = timed("load", stage_load, None)
+    timed("furniture", stage_furniture, floorplan)
+    pieces = timed("arrays", stage_arrays, floorplan)
+    timed("uv", stage_uv, pieces)
+    timed("solidify", stage_solidify, pieces)
+    timed("optimize", stage_optimize, pieces)
+    timed("transform", stage_transform, pieces)
+
+def benchmark(file_names, repeat):
+    results = {}
+    for file_name in file_names:
+        timings = {}
+        for i in range(repeat):
+            run_once(file_name, timings)
+        results[os.path.relpath(file_name, root_path)] = {
+            name: statistics.median(values) * 1000 for name, values in timings.items()}
+    return results
+
+#------------------------------------
+# Report
+def report(results):
+    stages = list(next(iter(results.values())).keys())
+    print("{:<36}".format("input (ms, median)") + "".join("{:>11}".format(s) for s in stages) + "{:>11}".format("total"))
+    for file_name, timings in results.items():
+        print("{:<36}".format(file_name) + "".join("{:>11.2f}".format(timings[s]) for s in stages)
+              + "{:>11.2f}".format(sum(timings.values())))
+
+def compare(results, baseline, tolerance):
+    slower = []
+    for file_name, timings in results.items():
+        for stage, ms in timings.items():
+            base = baseline.get(file_name, {}).get(stage)
+            # sub 0.1ms stages are noise
+            if base and ms > 0.1 and ms > base * tolerance:
+                slower.append((file_name, stage, base, ms))
+
+    for file_name, stage, base, ms in slower:
+        print("slower : {} {} {:.2f}ms -> {:.2f}ms".format(file_name, stage, base, ms))
+    return slower
+
+#------------------------------------
+# Export profiles
+COMPONENTS = {5120 : np.int8, 5121 : np.uint8, 5122 : np.int16, 5123 : np.uint16, 5125 : np.uint32, 5126 : np.float32}
+WIDTHS = {"SCALAR" : 1, "VEC2" : 2, "VEC3" : 3, "VEC4" : 4}
+
+def draco_decoder():
+    try:
+        import DracoPy
+    except ImportError:
+        return None
+    return getattr(DracoPy, "decode", None) or DracoPy.decode_buffer_to_mesh
+
+def decode_gltf(gltf_path, decoder):
+    # seconds to get every primitive back as arrays, None without a decoder
+    with open(gltf_path, 'r') as file:
+        gltf = json.load(file)
+    buffers = []
+    for buffer in gltf.get("buffers", []):
+        with open(os.path.join(os.path.dirname(gltf_path), buffer["uri"]), 'rb') as file:
+            buffers.append(file.read())
+
+    def view_bytes(index):
+        view = gltf["bufferViews"][index]
+        offset = view.get("byteOffset", 0)
+        return buffers[view["buffer"]][offset:offset + view["byteLength"]]
+
+    start = time.perf_counter()
+    for mesh in gltf.get("meshes", []):
+        for primitive in mesh["primitives"]:
+            draco = primitive.get("extensions", {}).get("KHR_draco_mesh_compression")
+            if draco:
+                if decoder is None:
+                    return None
+                decoder(view_bytes(draco["bufferView"]))
+                continue
+            for index in list(primitive["attributes"].values()) + [primitive.get("indices")]:
+                if index is None:
+                    continue
+                accessor = gltf["accessors"][index]
+                array = np.frombuffer(view_bytes(accessor["bufferView"]), dtype=COMPONENTS[accessor["componentType"]],
+                                      count=accessor["count"] * WIDTHS[accessor["type"]], offset=accessor.get("byteOffset", 0))
+                array.reshape(accessor["count"], -1).copy()
+    return time.perf_counter() - start
+
+def run_profile(args, profile, file_names, folder):
+    status_path = os.path.join(folder, "status.jsonl")
+    trace_path = os.path.join(folder, "trace.jsonl")
+    command = [args.blender, "--background", args.workspace, "--python", exporter_path, "--",
+               "--force", "--profile", profile, "--output", folder, "--status", status_path,
+               "--trace", trace_path] + file_names
+    with open(os.path.join(folder, "blender.log"), 'w') as log:
+        subprocess.run(command, stdout=log, stderr=subprocess.STDOUT)
+
+    failed = 0
+    if os.path.exists(status_path):
+        with open(status_path, 'r') as file:
+            for line in file:
+                failed += json.loads(line)["status"] == "failed"
+
+    # only the glTF export stage, the rest of the room is the same for every profile
+    encode = 0
+    if os.path.exists(trace_path):
+        with open(trace_path, 'r') as file:
+            for line in file:
+                encode += sum(s["ms"] for s in json.loads(line)["stages"] if s["name"] == "export") / 1000
+
+    gltf_paths = glob.glob(os.path.join(folder, "**", "*.gltf"), recursive=True)
+    size = sum(os.path.getsize(f) for f in glob.glob(os.path.join(folder, "**", "*.*"), recursive=True)
+               if f.endswith((".gltf", ".bin")))
+    decoder = draco_decoder()
+    decodes = [decode_gltf(f, decoder) for f in gltf_paths]
+    decode = None if None in decodes else sum(decodes)
+
+    return {"encode_s" : round(encode, 3), "size_kb" : size // 1024, "files" : len(gltf_paths), "failed" : failed,
+            "decode_ms" : None if decode is None else round(decode * 1000, 2)}
+
+def benchmark_profiles(args, file_names, names):
+    results = {}
+    folder = tempfile.mkdtemp(prefix="zigbang_profiles_")
+    try:
+        # textures go to the shared assets/textures whatever --output says. one
+        # untimed pass encodes them, so no profile is timed with the JPEG work
+        os.makedirs(os.path.join(folder, "warmup"))
+        run_profile(args, names[0], file_names, os.path.join(folder, "warmup"))
+        for profile in names:
+            os.makedirs(os.path.join(folder, profile))
+            results[profile] = run_profile(args, profile, file_names, os.path.join(folder, profile))
+    finally:
+        shutil.rmtree(folder)
+
+    print("{:<12}{:>12}{:>12}{:>14}{:>8}".format("profile", "encode (s)", "size (KB)", "decode (ms)", "failed"))
+    for profile, result in results.items():
+        decode = "n/a" if result["decode_ms"] is None else "{:.2f}".format(result["decode_ms"])
+        print("{:<12}{:>12.2f}{:>12}{:>14}{:>8}".format(profile, result["encode_s"], result["size_kb"], decode, result["failed"]))
+    if any(r["decode_ms"] is None for r in results.values()):
+        print("decode n/a : pip install DracoPy to time draco decoding")
+    return results
+
+#------------------------------------
+# Scaling
+SCALING_SIZES = {
+    "rooms" : [4, 16, 64, 256],
+    "furniture" : [20, 200, 2000, 20000],
+    "vertices" : [5000, 20000, 80000, 320000],
+}
+
+def growth(sizes, values):
+    # least squares slope of log(ms) over log(size)
+    ok = [(s, v) for s, v in zip(sizes, values) if v > 0.01]
+    if len(ok) < 2:
+        return None
+    x, y = np.log([s for s, v in ok]), np.log([v for s, v in ok])
+    return float(np.polyfit(x, y, 1)[0])
+
+def benchmark_scaling(args):
+    sizes = args.sizes or SCALING_SIZES[args.scaling]
+    plan_args = {"rooms" : args.rooms, "furniture" : args.furniture, "vertices" : args.vertices}
+
+    timings = {}
+    folder = tempfile.mkdtemp(prefix="zigbang_scaling_")
+    try:
+        for size in sizes:
+            plan_args[args.scaling] = size
+            file_name = ZigbangSynth.write(ZigbangSynth.floorplan(seed=0, **plan_args), os.path.join(folder, "{}.json".format(size)))
+            timings[size] = next(iter(benchmark([file_name], args.repeat).values()))
+    finally:
+        shutil.rmtree(folder)
+
+    stages = list(timings[sizes[0]])
+    exponents = {stage : growth(sizes, [timings[size][stage] for size in sizes]) for stage in stages}
+
+    print("{:<12}".format(args.scaling) + "".join("{:>11}".format(s) for s in stages))
+    for size in sizes:
+        print("{:<12}".format(size) + "".join("{:>11.2f}".format(timings[size][s]) for s in stages))
+    print("{:<12}".format("exponent") + "".join("{:>11}".format("n/a" if exponents[s] is None else "{:.2f}".format(exponents[s])) for s in stages))
+
+    superlinear = [s for s in stages if exponents[s] is not None and exponents[s] > args.superlinear]
+    for stage in superlinear:
+        print("superlinear : {} grows as {}^{:.2f}".format(stage, args.scaling, exponents[stage]))
+
+    results = {"scaling" : args.scaling, "base" : plan_args, "sizes" : sizes,
+               "timings" : {str(size) : timings[size] for size in sizes}, "exponents" : exponents}
+    return results, superlinear
+
+def main():
+    parser = argparse.ArgumentParser(prog="ZigbangBenchmark")
+    parser.add_argument("inputs", nargs="*", help="default: inputs/*.json inputs/temp/*.json")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", help="write the median timings to this JSON file")
+    parser.add_argument("--compare", help="baseline written by --save")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="allowed slowdown against the baseline")
+    parser.add_argument("--profile", action="store_true", help="print a cProfile of one pass instead")
+    parser.add_argument("--profiles", nargs="*", choices=list(ZigbangConfig.load_profiles()),
+                        help="export profiles to compare through blender. no names = all")
+    parser.add_argument("--blender", default=os.environ.get("BLENDER", "/Applications/Blender.app/Contents/MacOS/Blender"))
+    parser.add_argument("--workspace", default=os.path.join(root_path, "workspace.blend"))
+    parser.add_argument("--scaling", choices=list(SCALING_SIZES), help="benchmark synthetic plans growing in this")
+    parser.add_argument("--sizes", nargs="+", type=int, help="with --scaling. default: {}".format(SCALING_SIZES))
+    parser.add_argument("--rooms", type=int, default=4, help="with --scaling, when not scaled")
+    parser.add_argument("--furniture", type=int, default=20, help="with --scaling, when not scaled")
+    parser.add_argument("--vertices", type=int, default=5000, help="with --scaling, when not scaled")
+    parser.add_argument("--superlinear", type=float, default=1.3, help="flag stages growing faster than size^x")
+    args = parser.parse_args()
+
+    if args.scaling:
+        results, superlinear = benchmark_scaling(args)
+        if args.save:
+            with open(args.save, 'w') as file:
+                json.dump(results, file, indent=2)
+        return 1 if superlinear else 0
+
+    file_names = args.inputs or sorted(glob.glob(os.path.join(root_path, "inputs", "*.json"))
+                                       + glob.glob(os.path.join(root_path, "inputs", "temp", "*.json")))
+
+    if args.profiles is not None:
+        results = benchmark_profiles(args, file_names, args.profiles or list(ZigbangConfig.load_profiles()))
+        if args.save:
+            with open(args.save, 'w') as file:
+                json.dump(results, file, indent=2)
+        return 1 if any(r["failed"] for r in results.values()) else 0
+
+    if args.profile:
+        profile = cProfile.Profile()
+        profile.enable()
+        benchmark(file_names, 1)
+        profile.disable()
+        pstats.Stats(profile).sort_stats("cumulative").print_stats(25)
+        return 0
+
+    results = benchmark(file_names, args.repeat)
+    report(results)
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            if compare(results, json.load(file), args.tolerance):
+                return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
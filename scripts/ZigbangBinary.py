@@ -0,0 +1,169 @@
+#------------------------------------
+# Compact binary floorplan (.zfp)
+#
+#   python scripts/ZigbangBinary.py to-binary inputs/*.json   -> inputs/*.zfp
+#   python scripts/ZigbangBinary.py to-json inputs/*.zfp      -> inputs/*.json
+#
+# Layout (little-endian)
+#   "ZFP1" | uint32 header size | header JSON | buffers
+#
+# The header holds DanjiId, RoomTypeId, Level, Furnitures and WindowPoints as
+# they are in the JSON. Every WallAndFloors entry keeps its name and points
+# to flat buffers : vertices (n, 3), triangles (m), uv (k, 2) and normals
+# (n, 3) if the input has them. Buffers are 8 byte aligned and relative to
+# the end of the header, so load() can hand out memory mapped numpy views.
+
+import argparse
+import json
+import os
+import struct
+import sys
+
+import numpy as np
+
+MAGIC = b"ZFP1"
+ALIGN = 8
+
+# buffer name -> (json keys, stored dtype)
+BUFFERS = {
+    "vertices" : (("x", "y", "z"), "<f4"),
+    "triangles" : (None, "<i4"),
+    "uv" : (("x", "y"), "<f4"),
+    "normals" : (("x", "y", "z"), "<f4"),
+}
+
+def _pad(size):
+    return (ALIGN - size % ALIGN) % ALIGN
+
+def _points(points, keys):
+    array = np.fromiter((p[k] for p in points for k in keys), dtype=np.float64, count=len(points) * len(keys))
+    return array.reshape(-1, len(keys))
+
+def _pack(values, keys, dtype):
+    if keys is None:
+        return np.asarray(values, dtype=dtype), dtype
+
+    array = _points(values, keys)
+    packed = array.astype(dtype)
+    # unity writes float32, keep float64 for anything that would not survive the cast
+    if not np.array_equal(packed, array):
+        dtype = "<f8"
+        packed = array.astype(dtype)
+    return packed, dtype
+
+#------------------------------------
+# JSON dict -> .zfp
+def dump(floorplan, file_path):
+    header = {k: v for k, v in floorplan.items() if k != "WallAndFloors"}
+    header["WallAndFloors"] = []
+
+    buffers = []
+    offset = 0
+    for data in floorplan["WallAndFloors"]:
+        entry = {"name": data["name"]}
+        for name, (keys, dtype) in BUFFERS.items():
+            if not name in data:
+                continue
+            packed, dtype = _pack(data[name], keys, dtype)
+            entry[name] = {"offset": offset, "count": len(packed), "dtype": dtype}
+            raw = packed.tobytes()
+            buffers.append(raw + b"\0" * _pad(len(raw)))
+            offset += len(raw) + _pad(len(raw))
+        header["WallAndFloors"].append(entry)
+
+    raw_header = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    raw_header += b" " * _pad(len(MAGIC) + 4 + len(raw_header))
+
+    temp_path = "{}.{}.tmp".format(file_path, os.getpid())
+    with open(temp_path, 'wb') as file:
+        file.write(MAGIC)
+        file.write(struct.pack("<I", len(raw_header)))
+        file.write(raw_header)
+        for raw in buffers:
+            file.write(raw)
+    os.replace(temp_path, file_path)
+
+#------------------------------------
+# .zfp -> dict. WallAndFloors buffers are read only views of a memory map.
+def load_binary(file_path):
+    data = np.memmap(file_path, dtype=np.uint8, mode='r')
+    if bytes(data[:4]) != MAGIC:
+        raise ValueError("{} is not a zigbang floorplan".format(file_path))
+
+    size = struct.unpack("<I", bytes(data[4:8]))[0]
+    floorplan = json.loads(bytes(data[8:8 + size]).decode("utf-8"))
+    start = 8 + size
+
+    for entry in floorplan["WallAndFloors"]:
+        for name, (keys, _) in BUFFERS.items():
+            if not name in entry:
+                continue
+            info = entry[name]
+            dtype = np.dtype(info["dtype"])
+            width = len(keys) if keys else 1
+            begin = start + info["offset"]
+            end = begin + info["count"] * width * dtype.itemsize
+            array = data[begin:end].view(dtype)
+            entry[name] = array.reshape(-1, width) if keys else array
+
+    return floorplan
+
+def load(file_path):
+    if file_path.endswith(".zfp"):
+        return load_binary(file_path)
+    with open(file_path, 'r') as file:
+        return json.load(file)
+
+#------------------------------------
+# .zfp -> JSON schema, floats are the same float32 values unity wrote
+def to_json(floorplan):
+    result = {k: v for k, v in floorplan.items() if k != "WallAndFloors"}
+    result["WallAndFloors"] = []
+    for entry in floorplan["WallAndFloors"]:
+        data = {"name": entry["name"]}
+        for name, (keys, _) in BUFFERS.items():
+            if not name in entry:
+                continue
+            array = np.asarray(entry[name])
+            if keys is None:
+                data[name] = array.tolist()
+            else:
+                data[name] = [dict(zip(keys, p)) for p in array.astype(np.float64).tolist()]
+        result["WallAndFloors"].append(data)
+    return result
+
+def convert(file_path, output_dir=None):
+    stem, ext = os.path.splitext(file_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        stem = os.path.join(output_dir, os.path.basename(stem))
+
+    if ext == ".zfp":
+        output_path = stem + ".json"
+        with open(output_path, 'w') as file:
+            json.dump(to_json(load_binary(file_path)), file, ensure_ascii=False, indent=4)
+    else:
+        output_path = stem + ".zfp"
+        dump(load(file_path), output_path)
+
+    return output_path
+
+def main():
+    parser = argparse.ArgumentParser(prog="ZigbangBinary")
+    parser.add_argument("command", choices=["to-binary", "to-json"])
+    parser.add_argument("inputs", nargs="+")
+    parser.add_argument("-o", "--output-dir")
+    args = parser.parse_args()
+
+    ext = ".json" if args.command == "to-binary" else ".zfp"
+    for file_path in args.inputs:
+        if not file_path.endswith(ext):
+            print("skip {}".format(file_path))
+            continue
+        output_path = convert(file_path, args.output_dir)
+        print("{} ({} KB) -> {} ({} KB)".format(file_path, os.path.getsize(file_path) // 1024,
+                                             output_path, os.path.getsize(output_path) // 1024))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+#------------------------------------
+# Incremental export cache.
+#
+# Every input gets a manifest entry in assets/manifest with the key it was
+# exported with. The key hashes the input file, source.blend, the exporter
+# version and the export options, so a room is exported again only when one
+# of them changed. One small file per input keeps parallel workers from
+# overwriting each other.
+
+import hashlib
+import json
+import os
+
+import ZigbangConfig
+
+_file_hashes = {}
+
+def file_hash(file_path):
+    if not os.path.exists(file_path):
+        return None
+
+    stat = os.stat(file_path)
+    cache = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+    if cache not in _file_hashes:
+        sha = hashlib.sha256()
+        with open(file_path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                sha.update(block)
+        _file_hashes[cache] = sha.hexdigest()
+
+    return _file_hashes[cache]
+
+def cache_key(input_path, source_path, options):
+    data = {
+        "input" : file_hash(input_path),
+        "source" : file_hash(source_path),
+        "version" : ZigbangConfig.EXPORTER_VERSION,
+        "options" : options,
+    }
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+#------------------------------------
+# Manifest
+def manifest_path(root_path, input_path):
+    name = os.path.relpath(os.path.abspath(input_path), root_path)
+    entry = hashlib.sha1(name.encode()).hexdigest()[:16]
+    return os.path.join(root_path, "assets", "manifest", "{}.json".format(entry))
+
+def load_entry(root_path, input_path):
+    entry_path = manifest_path(root_path, input_path)
+    if not os.path.exists(entry_path):
+        return None
+    try:
+        with open(entry_path, 'r') as file:
+            return json.load(file)
+    except ValueError:
+        return None
+
+# current only while every file of the export (LODs, renders, .bin) is there
+def is_current(root_path, input_path, key):
+    entry = load_entry(root_path, input_path)
+    if not entry or entry.get("key") != key:
+        return False
+    return all(os.path.exists(os.path.join(root_path, f)) for f in entry.get("outputs", [entry["output"]]))
+
+def record(root_path, input_path, key, output_path, outputs=()):
+    entry_path = manifest_path(root_path, input_path)
+    relative = lambda f: os.path.relpath(os.path.abspath(f), root_path)
+    entry = {
+        "input" : relative(input_path),
+        "output" : relative(output_path),
+        "outputs" : list(dict.fromkeys(relative(f) for f in [output_path, *outputs])),
+        "key" : key,
+        "version" : ZigbangConfig.EXPORTER_VERSION,
+    }
+
+    directory = os.path.dirname(entry_path)
+    if not os.path.exists(directory):
+        os.makedirs(directory, exist_ok=True)
+
+    # write then rename, a killed worker never leaves half an entry
+    temp_path = "{}.{}.tmp".format(entry_path, os.getpid())
+    with open(temp_path, 'w') as file:
+        json.dump(entry, file, indent=2)
+    os.replace(temp_path, entry_path)
@@ -0,0 +1,91 @@
+#------------------------------------
+# Exporter settings shared by blender scripts and plain python tools.
+# No bpy import here.
+
+import json
+import os
+
+config_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config")
+
+# bump when a change in the exporter changes the generated glTF
+EXPORTER_VERSION = "1.5.0"
+
+# resident memory (MB) of a blender worker above which the source library
+# drops datablocks the last room did not use (--memory-ceiling)
+MEMORY_CEILING_MB = 4096
+
+# exit code of a --bounded worker that is still above the ceiling after a
+# purge. the batch driver runs its remaining files in a new process
+RECYCLE_EXIT_CODE = 75
+
+# texture quality tiers (--quality) -> longest side in pixels, None = source size
+TEXTURE_TIERS = {"full" : None, "high" : 2048, "medium" : 1024, "low" : 512}
+
+# decimate ratio of furniture LOD 1, 2, 3 (--lods)
+LOD_RATIOS = (0.5, 0.25, 0.1)
+
+# thumbnails (--render). <model>.png from the top, <model>_view<n>.png from
+# every window point. CPU only presets, workbench needs no lights or samples
+RENDER_PRESETS = {
+    "workbench" : {"engine" : 'BLENDER_WORKBENCH'},
+    "cycles" : {"engine" : 'CYCLES', "samples" : 16},
+}
+RENDER_TOP_SIZE = (1280, 1280)
+RENDER_VIEW_SIZE = (1280, 720)
+RENDER_VIEW_LENS = 16
+
+#------------------------------------
+# bpy.ops.export_scene.gltf options. filepath / export_texture_dir are set per room.
+GLTF_OPTIONS = {
+    "check_existing" : True,
+    "export_format" : 'GLTF_SEPARATE',
+#    "export_format" : 'GLB',
+    # textures are encoded once by ZigbangTextures, the glTF keeps their uri
+    "export_image_format" : 'AUTO',
+    "export_keep_originals" : True,
+    "export_copyright" : 'Zigbang',
+
+    # draco settings come from the profile, config/export_profiles.json
+
+    #------------------------------------
+#    "export_texcoords" : True,
+    "export_normals" : True,
+#    "export_tangents" : True,
+#    "export_materials" : 'EXPORT',
+#    "export_original_specular" : False,
+#    "export_colors" : True,
+#    "use_mesh_edges" : True,
+#    "use_mesh_vertices" : True,
+
+    #------------------------------------
+    "export_cameras" : True,
+    "export_animations" : False,
+    "export_frame_range" : False,
+    "export_force_sampling" : False,
+    "export_nla_strips" : False,
+    "export_def_bones" : False,
+    "export_optimize_animation_size" : False,
+    "export_anim_single_armature" : False,
+    "export_current_frame" : False,
+    "export_skins" : False,
+    "export_all_influences" : False,
+    "export_morph" : False,
+    "export_morph_normal" : False,
+    "export_morph_tangent" : False,
+    "export_lights" : True,
+}
+
+#------------------------------------
+# Export profiles (--profile). Named draco settings merged over GLTF_OPTIONS.
+DEFAULT_PROFILE = "balanced"
+
+def load_profiles():
+    with open(os.path.join(config_path, "export_profiles.json"), 'r') as file:
+        return json.load(file)
+
+def gltf_options(profile=DEFAULT_PROFILE):
+    return dict(GLTF_OPTIONS, **load_profiles()[profile])
+
+# options that decide the output of the blender exporter, for the export cache
+def export_options(quality="full", lods=0, merge_frame=False, profile=DEFAULT_PROFILE, render=None, atlas=False):
+    return dict(gltf_options(profile), texture_quality=quality, lods=lods, merge_frame=merge_frame, render=render, atlas=atlas)
@@ -1,90 +1,64 @@
 import bpy
 
 #------------------------------------
-# Scene Clear
-def clear():
-    for c in bpy.data.collections:
+# Scene Clear. datablocks in keep (the source library) stay resident.
+def clear(keep=()):
+    keep = set(keep)
+    for c in list(bpy.data.collections):
         bpy.data.collections.remove(c)
-    for o in bpy.context.scene.collection.objects:
-        bpy.data.objects.remove(o)
-    for m in bpy.data.materials:
-        bpy.data.materials.remove(m)
-    for m in bpy.data.meshes:
-        bpy.data.meshes.remove(m)
-    for i in bpy.data.images:
-        if not ".hdr" in i.name:
+    for o in list(bpy.data.objects):
+        if not o in keep:
+            bpy.data.objects.remove(o)
+    for m in list(bpy.data.materials):
+        if not m in keep:
+            bpy.data.materials.remove(m)
+    for m in list(bpy.data.meshes):
+        if not m in keep:
+            bpy.data.meshes.remove(m)
+    for l in list(bpy.data.lights):
+        bpy.data.lights.remove(l)
+    for c in list(bpy.data.cameras):
+        bpy.data.cameras.remove(c)
+    for i in list(bpy.data.images):
+        if not ".hdr" in i.name and not i in keep:
             bpy.data.images.remove(i)
             
 #------------------------------------
-# calculate bound box
-
-from mathutils import Vector
-from functools import reduce
-from itertools import product
-
-def merge_boxes(objects):
-    return reduce(lambda x, y: x + y,
-        [Box(obj) for obj in objects if obj.type == 'MESH'])
-
-class Box:
-    def __init__(self, bl_object=None, max_min=None):
-        if bl_object and bl_object.type == 'MESH':
-            self.__bound_box = self.__get_bound_box_from_object(bl_object)
-        elif max_min:
-            self.__bound_box = self.__get_bound_box_from_max_min(max_min)
-        else:
-            raise TypeError()
-
-    def __add__(self, bound_box):
-        return self.merge(bound_box)
-
-    def __getitem__(self, index):
-        return self.__bound_box[index]
-
-    @property
-    def max(self):
-        return Vector(max((v.x, v.y, v.z) for v in self.__bound_box))
-
-    @property
-    def min(self):
-        return Vector(min((v.x, v.y, v.z) for v in self.__bound_box))
-
-    @property
-    def center(self):
-        return sum((v for v in self.__bound_box), Vector()) / 8
-
-    def merge(self, box):
-        if not box:
-            return self
-
-        if not isinstance(box, Box):
-            raise TypeError('Require a Box object')
-
-        max_new = Vector(map(max, zip(self.max, box.max)))
-        min_new = Vector(map(min, zip(self.min, box.min)))
-
-        return Box(max_min = (max_new, min_new))
-
-    def __get_bound_box_from_object(self, bl_object):
-        return [bl_object.matrix_world @ Vector(v) \
-                for v in bl_object.bound_box]
+# calculate bound box. world space boxes of all mesh objects in one batch,
+# rows of mins / maxs follow the returned object list (ZigbangGeometry)
 
-    def __get_bound_box_from_max_min(self, max_min):
-        max_point, min_point = max_min
+from mathutils import Matrix
 
-        return [Vector(v) for v in product((max_point.x, min_point.x),
-                                           (max_point.y, min_point.y),
-                                           (max_point.z, min_point.z))]
+def mesh_bounds(objects):
+    meshes = [obj for obj in objects if obj.type == 'MESH']
+    corners = np.array([obj.bound_box for obj in meshes], dtype=np.float64).reshape(-1, 8, 3)
+    matrices = np.array([obj.matrix_world for obj in meshes], dtype=np.float64).reshape(-1, 4, 4)
+    mins, maxs = ZigbangGeometry.object_bounds(corners, matrices)
+    return meshes, mins, maxs
 
 
 #------------------------------------
 # Generate
 import json
-import math
 import bmesh
 import glob
 import os
+import sys
+import time
+import traceback
+import argparse
 import uuid
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import ZigbangConfig
+import ZigbangAtlas
+import ZigbangCache
+import ZigbangBinary
+import ZigbangGeometry
+import ZigbangSpool
+import ZigbangTextures
+import ZigbangTrace
 
 def createFolder(directory):
     try:
@@ -92,355 +66,910 @@ def createFolder(directory):
             os.makedirs(directory)
     except OSError:
         print ('Error: Creating directory. ' +  directory)
+
+#------------------------------------
+# Source Library
+# Objects and materials of source.blend are loaded once per process through
+# the data API and stay resident between rooms. Furniture placements are
+# linked duplicates, so all chairs of a room share one mesh and the glTF gets
+# one mesh with a node per chair. Decimated LOD meshes are built once per
+# asset and ratio. Every datablock remembers the last room that used it,
+# purge() drops the ones the current room did not need.
+class SourceLibrary:
+    def __init__(self, source_path):
+        self.source_path = source_path
+        self.objects = {}
+        self.materials = {}
+        self.lods = {}
+        self.last_used = {}
+        self.room = 0
+
+    def get(self, name):
+        if not name in self.objects:
+            self.objects[name] = self.__load("objects", name)
+            if self.objects[name] and self.objects[name].type == 'MESH':
+                optimize_furniture(self.objects[name].data)
+        self.last_used[("objects", name)] = self.room
+        return self.objects[name]
+
+    def place(self, name):
+        template = self.get(name)
+        if template is None:
+            return None
+        return template.copy()
+
+    def lod(self, name, ratio):
+        key = (name, ratio)
+        if not key in self.lods:
+            template = self.get(name)
+            # decimate a throw away object sharing the mesh, the template stays untouched
+            temp = bpy.data.objects.new("LOD", template.data)
+            bpy.context.scene.collection.objects.link(temp)
+            modifier = temp.modifiers.new("Decimate", 'DECIMATE')
+            modifier.ratio = ratio
+            depsgraph = bpy.context.evaluated_depsgraph_get()
+            mesh = bpy.data.meshes.new_from_object(temp.evaluated_get(depsgraph))
+            mesh.name = "{}_LOD{}".format(template.data.name, ratio)
+            mesh.use_fake_user = True
+            bpy.data.objects.remove(temp)
+            self.lods[key] = mesh
+        self.last_used[("lods", key)] = self.room
+        return self.lods[key]
+
+    def material(self, name):
+        if not name in self.materials:
+            # furniture may have brought it in already
+            self.materials[name] = bpy.data.materials.get(name) or self.__load("materials", name)
+            if self.materials[name]:
+                self.materials[name].use_fake_user = True
+        self.last_used[("materials", name)] = self.room
+        return self.materials[name]
+
+    def resident(self):
+        ids = set()
+        for obj in self.objects.values():
+            if obj is None:
+                continue
+            ids.add(obj)
+            if obj.data:
+                ids.add(obj.data)
+            for slot in obj.material_slots:
+                if slot.material:
+                    ids.add(slot.material)
+                    ids.update(material_images(slot.material))
+        for material in self.materials.values():
+            if material:
+                ids.add(material)
+                ids.update(material_images(material))
+        ids.update(self.lods.values())
+        return ids
+
+    def reset(self, full=False):
+        # next room. full drops the library as well, like a fresh process
+        if full:
+            self.release(everything=True)
+        clear(self.resident())
+        self.room += 1
+
+    def release(self, everything=False):
+        for kind, cache in (("objects", self.objects), ("materials", self.materials), ("lods", self.lods)):
+            for name in list(cache):
+                if everything or self.last_used.get((kind, name)) != self.room:
+                    if cache[name]:
+                        cache[name].use_fake_user = False
+                    del cache[name]
+                    self.last_used.pop((kind, name), None)
+
+    def release_lods(self):
+        for key in list(self.lods):
+            bpy.data.meshes.remove(self.lods.pop(key))
+            self.last_used.pop(("lods", key), None)
+
+    def purge(self):
+        # keep what the current room used, free everything else
+        self.release()
+        clear(self.resident())
+        bpy.data.orphans_purge(do_local_ids=True, do_linked_ids=True, do_recursive=True)
+
+    def __load(self, kind, name):
+        if not os.path.exists(self.source_path):
+            return None
+
+        with bpy.data.libraries.load(self.source_path, link=False) as (data_from, data_to):
+            setattr(data_to, kind, [name] if name in getattr(data_from, kind) else [])
+
+        loaded = getattr(data_to, kind)
+        if not loaded or loaded[0] is None:
+            return None
+
+        loaded[0].use_fake_user = True
+        return loaded[0]
+
+#------------------------------------
+# Furniture meshes get the same pass as the frame (ZigbangGeometry), through
+# bmesh so custom normals, UVs and every other layer survive. Vertices are
+# welded only where that can not change shading : all faces flat and no
+# custom normals, which are stored relative to the smooth fans a weld joins.
+def optimize_furniture(mesh):
+    bm = bmesh.new()
+    bm.from_mesh(mesh)
+
+    if not mesh.has_custom_normals and not any(f.smooth for f in bm.faces):
+        bmesh.ops.remove_doubles(bm, verts=bm.verts, dist=0.0001)
+    bmesh.ops.dissolve_degenerate(bm, dist=0.0001, edges=bm.edges)
+
+    bm.verts.index_update()
+    bm.faces.index_update()
+    triangles = bm.calc_loop_triangles()
+    if triangles:
+        loops = np.array([[loop.vert.index for loop in triangle] for triangle in triangles], dtype=np.int64)
+        faces = np.array([triangle[0].face.index for triangle in triangles], dtype=np.int64)
+        order = ZigbangGeometry.tipsify(loops, len(bm.verts))
+
+        # faces by their first triangle, vertices by first use
+        _, first = np.unique(faces[order], return_index=True)
+        face_rank = np.empty(len(bm.faces), dtype=np.int64)
+        face_rank[faces[order][np.sort(first)]] = np.arange(len(first))
+        bm.faces.sort(key=lambda f: face_rank[f.index])
+
+        flat = loops[order].ravel()
+        _, first = np.unique(flat, return_index=True)
+        vert_rank = np.full(len(bm.verts), len(bm.verts), dtype=np.int64)
+        vert_rank[flat[np.sort(first)]] = np.arange(len(first))
+        bm.verts.sort(key=lambda v: vert_rank[v.index])
+
+    bm.to_mesh(mesh)
+    bm.free()
+    mesh.update()
+
+def material_images(material):
+    if not material.node_tree:
+        return []
+    return [node.image for node in material.node_tree.nodes
+            if node.type == 'TEX_IMAGE' and node.image]
+
+#------------------------------------
+# Mesh from arrays. JSON points become one rounded numpy array (ZigbangGeometry)
+# and go into the mesh with foreach_set, no python tuple per vertex or face.
+def build_mesh(name, co, triangles):
+    loops = ZigbangGeometry.to_triangles(triangles)
+    count = len(loops) // 3
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(co))
+    mesh.vertices.foreach_set("co", co.astype(np.float32).ravel())
+    mesh.loops.add(len(loops))
+    mesh.loops.foreach_set("vertex_index", loops)
+    mesh.polygons.add(count)
+    mesh.polygons.foreach_set("loop_start", np.arange(0, len(loops), 3, dtype=np.int32))
+    mesh.polygons.foreach_set("loop_total", np.full(count, 3, dtype=np.int32))
+    mesh.update(calc_edges=True)
+    return mesh
+
+#------------------------------------
+# Apply Transforms. One matrix goes straight into the vertex arrays of single
+# user meshes, their objects end up at identity. Linked duplicates share their
+# mesh with the library, so they (and non mesh objects) only get a new matrix
+# and are exported as nodes of one mesh.
+def apply_matrix(objects, matrix):
+    for ob in objects:
+        if ob.parent is not None:
+            continue
+
+        world = matrix @ np.array(ob.matrix_world, dtype=np.float64)
+        if ob.type == 'MESH' and ob.data.users == 1 and not ob.children:
+            me = ob.data
+            co = np.empty(len(me.vertices) * 3, dtype=np.float32)
+            me.vertices.foreach_get("co", co)
+            co = ZigbangGeometry.transform_points(world, co.reshape(-1, 3).astype(np.float64))
+            me.vertices.foreach_set("co", co.astype(np.float32).ravel())
+            me.update()
+            ob.matrix_world = Matrix.Identity(4)
+        else:
+            ob.matrix_world = Matrix(world.tolist())
+
+#------------------------------------
+# Merge Frame. Frame pieces are baked by apply_matrix, so pieces sharing a
+# material only need their arrays concatenated (ZigbangGeometry) to become
+# one object, one glTF primitive and one draw call.
+def merge_frame(collection):
+    groups = {}
+    for ob in collection.objects:
+        if ob.type == 'MESH' and len(ob.data.loops) == len(ob.data.polygons) * 3:
+            groups.setdefault(ob.active_material, []).append(ob)
+
+    for material, objects in groups.items():
+        if len(objects) < 2:
+            continue
+
+        pieces = []
+        for ob in objects:
+            me = ob.data
+            co = np.empty(len(me.vertices) * 3, dtype=np.float32)
+            me.vertices.foreach_get("co", co)
+            triangles = np.empty(len(me.loops), dtype=np.int32)
+            me.loops.foreach_get("vertex_index", triangles)
+            loop_uvs = None
+            if me.uv_layers.active:
+                loop_uvs = np.empty(len(me.loops) * 2, dtype=np.float32)
+                me.uv_layers.active.data.foreach_get("uv", loop_uvs)
+                loop_uvs = loop_uvs.reshape(-1, 2)
+            world = np.array(ob.matrix_world, dtype=np.float64)
+            pieces.append((ZigbangGeometry.transform_points(world, co.reshape(-1, 3)), triangles, loop_uvs))
+
+        co, triangles, loop_uvs = ZigbangGeometry.merge_pieces(pieces)
+        name = material.name if material else "Frame"
+        mesh = build_mesh(name, co, triangles)
+        uvlayer = mesh.uv_layers.new(name=name)
+        if loop_uvs is not None:
+            uvlayer.data.foreach_set("uv", loop_uvs.astype(np.float32).ravel())
+        if material:
+            mesh.materials.append(material)
+
+        collection.objects.link(bpy.data.objects.new(name, mesh))
+        for ob in objects:
+            me = ob.data
+            bpy.data.objects.remove(ob)
+            bpy.data.meshes.remove(me)
+
+#------------------------------------
+# Textures. Images of the scene are encoded once into assets/textures
+# (ZigbangTextures) and repointed there, the glTF exporter keeps that uri
+# (export_keep_originals) instead of encoding them again for every room.
+def image_pixels(image):
+    # (height, width, 4) RGBA, row 0 at the bottom
+    width, height = image.size
+    pixels = np.empty(width * height * image.channels, dtype=np.float32)
+    image.pixels.foreach_get(pixels)
+    pixels = pixels.reshape(height, width, image.channels)
+
+    rgba = np.ones((height, width, 4), dtype=np.float32)
+    rgba[..., :3] = pixels[..., :3] if image.channels >= 3 else pixels[..., :1]
+    return rgba
+
+def new_image(name, rgba):
+    height, width = rgba.shape[:2]
+    image = bpy.data.images.new(name, width, height, alpha=False)
+    image.pixels.foreach_set(rgba.ravel())
+    return image
+
+def encode_image(image, path, size=None, normal=False):
+    width, height = image.size
+    temp = new_image("ZigbangTexture", image_pixels(image))
+
+    # quality tier variant, normal maps are renormalized after filtering
+    scaled = ZigbangTextures.target_size(width, height, size)
+    if scaled:
+        temp.scale(*scaled)
+        if normal:
+            rgba = np.empty(scaled[0] * scaled[1] * 4, dtype=np.float32)
+            temp.pixels.foreach_get(rgba)
+            rgba = rgba.reshape(-1, 4)
+            rgba[:, :3] = ZigbangTextures.renormalize(rgba[:, :3])
+            temp.pixels.foreach_set(rgba.ravel())
+
+    temp.filepath_raw = ZigbangTextures.temp_path(path)
+    temp.file_format = ZigbangTextures.IMAGE_FORMAT
+    temp.save()
+    bpy.data.images.remove(temp)
+    os.replace(ZigbangTextures.temp_path(path), path)
+
+# Encodes the images of objects for quality and returns {image : encoded
+# file}. The images keep their source, the key always comes from it.
+def publish_textures(path, objects, quality="full"):
+    size = ZigbangConfig.TEXTURE_TIERS[quality]
+    createFolder(ZigbangTextures.texture_dir(path))
+
+    images = set()
+    for ob in objects:
+        for slot in ob.material_slots:
+            if slot.material:
+                images.update(material_images(slot.material))
+
+    entries = {}
+    published = {}
+    for image in images:
+        source = bpy.path.abspath(image.filepath) if image.filepath else ""
+        if not image.has_data and not os.path.exists(source):
+            continue
+
+        key = ZigbangTextures.content_key(source_path=source if os.path.exists(source) else None, size=size)
+        if key is None:
+            key = ZigbangTextures.content_key(data=image_pixels(image).tobytes(), size=size)
+
+        # variants built ahead by ZigbangTextures.py are picked up here as well
+        output_path = ZigbangTextures.output_path(key, root=path)
+        if not os.path.exists(output_path):
+            normal = ZigbangTextures.is_normal_map(source or image.name)
+            encode_image(image, output_path, size, normal)
+
+        ZigbangTextures.add_entry(entries, source or "image:{}".format(image.name), key, output_path, path, size)
+        published[image] = output_path
+
+    ZigbangTextures.update_index(entries, path)
+    return published
+
+# point the images at their encoded files for the glTF export only. raw
+# paths, so nothing reloads. returns the sources for restore_images
+def point_images(published):
+    sources = {image : image.filepath_raw for image in published}
+    for image, output_path in published.items():
+        image.filepath_raw = output_path
+    return sources
+
+def restore_images(sources):
+    for image, source in sources.items():
+        image.filepath_raw = source
+
+#------------------------------------
+# Frame atlas (--atlas). Pieces whose uvs fit one repeat of their texture
+# move to one material with a color atlas and, if any material has one, a
+# normal atlas (ZigbangAtlas). The atlas material is a copy of one of the
+# packed materials, so it keeps that material's other settings.
+def texture_nodes(material):
+    # (color node, normal node), either may be None
+    color = normal = None
+    for node in material.node_tree.nodes if material.node_tree else []:
+        if node.type != 'TEX_IMAGE' or not node.image:
+            continue
+        if any(link.to_node.type == 'NORMAL_MAP' for link in node.outputs["Color"].links) \
+           or ZigbangTextures.is_normal_map(node.image.filepath or node.image.name):
+            normal = normal or node
+        else:
+            color = color or node
+    return color, normal
+
+def atlas_frame(collection, name):
+    pieces = []
+    for ob in collection.objects:
+        me = ob.data if ob.type == 'MESH' else None
+        if me is None or not len(me.loops) or not me.uv_layers.active or not ob.active_material:
+            continue
+        if texture_nodes(ob.active_material)[0] is None:
+            continue
+        loop_uvs = np.empty(len(me.loops) * 2, dtype=np.float32)
+        me.uv_layers.active.data.foreach_get("uv", loop_uvs)
+        loop_uvs = loop_uvs.reshape(-1, 2)
+        offset = ZigbangAtlas.fit_offset(loop_uvs)
+        # tiled uvs keep their material
+        if offset is not None:
+            pieces.append((ob, loop_uvs, offset))
+
+    materials = list(dict.fromkeys(ob.active_material for ob, loop_uvs, offset in pieces))
+    if len(materials) < 2:
+        return 0
+    nodes = [texture_nodes(m) for m in materials]
+    sizes, positions, size = ZigbangAtlas.layout([tuple(color.image.size) for color, normal in nodes])
+
+    # a template with a normal map when there is one
+    template = max(range(len(materials)), key=lambda i: nodes[i][1] is not None)
+    atlas = materials[template].copy()
+    atlas.name = "{}_Atlas".format(name)
+    color_node, normal_node = texture_nodes(atlas)
+
+    tiles = [ZigbangAtlas.resize(image_pixels(color.image), w, h) for (color, normal), (w, h) in zip(nodes, sizes)]
+    color_node.image = new_image(atlas.name, ZigbangAtlas.compose(tiles, positions, size))
+    if normal_node:
+        flat = np.array([0.5, 0.5, 1, 1], dtype=np.float32)
+        tiles = [ZigbangAtlas.resize(image_pixels(normal.image), w, h) if normal else np.tile(flat, (h, w, 1))
+                 for (color, normal), (w, h) in zip(nodes, sizes)]
+        rgba = ZigbangAtlas.compose(tiles, positions, size)
+        rgba[..., :3] = ZigbangTextures.renormalize(rgba[..., :3])
+        normal_node.image = new_image("{}_normal".format(atlas.name), rgba)
+        normal_node.image.colorspace_settings.name = 'Non-Color'
+
+    index = {m: i for i, m in enumerate(materials)}
+    for ob, loop_uvs, offset in pieces:
+        i = index[ob.active_material]
+        uvs = ZigbangAtlas.remap(loop_uvs, offset, positions[i], sizes[i], size)
+        ob.data.uv_layers.active.data.foreach_set("uv", uvs.astype(np.float32).ravel())
+        ob.active_material = atlas
+    return len(materials)
+
+#------------------------------------
+# Rendering. One camera moves from the top view to every window point, the
+# room is built once for all images (ZigbangConfig.RENDER_PRESETS).
+def setup_render(engine):
+    scene = bpy.context.scene
+    preset = ZigbangConfig.RENDER_PRESETS[engine]
+    scene.render.engine = preset["engine"]
+    scene.render.image_settings.file_format = 'PNG'
+    if preset["engine"] == 'CYCLES':
+        scene.cycles.device = 'CPU'
+        scene.cycles.samples = preset["samples"]
+        scene.cycles.use_denoising = False
+    else:
+        scene.display.shading.light = 'STUDIO'
+        scene.display.shading.color_type = 'TEXTURE'
+
+def render_still(file_path, size):
+    render = bpy.context.scene.render
+    render.resolution_x, render.resolution_y = size
+    render.filepath = file_path
+    bpy.ops.render.render(write_still=True)
+
+# returns the files written
+def render_views(engine, camera, views, room_path, model_name):
+    setup_render(engine)
+    scene = bpy.context.scene
+
+    # ceilings would hide the room from above
+    roofs = [ob for ob in scene.objects if not ob.hide_render and
+             ("Roof" in ob.name or (ob.active_material and "Roof" in ob.active_material.name))]
+    for ob in roofs:
+        ob.hide_render = True
+    outputs = ['{}/{}.png'.format(room_path, model_name)]
+    render_still(outputs[0], ZigbangConfig.RENDER_TOP_SIZE)
+    for ob in roofs:
+        ob.hide_render = False
+
+    top = (camera.location.copy(), camera.rotation_euler.copy(), camera.data.lens, camera.data.clip_start)
+    camera.data.lens = ZigbangConfig.RENDER_VIEW_LENS
+    camera.data.clip_start = 1
+    for i, (location, rotation, living) in enumerate(views):
+        camera.location = location.tolist()
+        camera.rotation_euler = rotation.tolist()
+        outputs.append('{}/{}_view{}{}.png'.format(room_path, model_name, i, "_living" if living else ""))
+        render_still(outputs[-1], ZigbangConfig.RENDER_VIEW_SIZE)
+    camera.location, camera.rotation_euler, camera.data.lens, camera.data.clip_start = top
+    return outputs
+
+#------------------------------------
+# Status
+def scene_counts():
+    meshes = {ob.data for ob in bpy.context.scene.objects if ob.type == 'MESH'}
+    return {"objects" : len(bpy.context.scene.objects), "vertices" : sum(len(me.vertices) for me in meshes)}
+
+# rough MB held by mesh arrays and image pixels of all datablocks (--bounded).
+# bytes per vertex / loop / polygon : position, edges, uv and offsets
+def datablock_memory():
+    mesh_bytes = sum(len(me.vertices) * 36 + len(me.loops) * 16 + len(me.polygons) * 8 for me in bpy.data.meshes)
+    image_bytes = sum(image.size[0] * image.size[1] * image.channels * (4 if image.is_float else 1)
+                      for image in bpy.data.images if image.has_data)
+    return {"meshes" : len(bpy.data.meshes), "images" : len(bpy.data.images),
+            "mesh_mb" : round(mesh_bytes / 1024 / 1024, 1), "image_mb" : round(image_bytes / 1024 / 1024, 1)}
+
+def write_status(status_path, result):
+    print(json.dumps(result))
+    if status_path:
+        with open(status_path, 'a') as file:
+            file.write(json.dumps(result) + "\n")
         
-def execute():
+def generate(path, file_name, library, args, trace):
+    
+    trace.start("load")
+    dict = ZigbangBinary.load(file_name)
+
+    danji_id = dict["DanjiId"]
+    room_type_id = dict["RoomTypeId"]
+    level = dict["Level"]
+
+    #------------------------------------
+    # Generate Collections
+    model_name = "{}_{}_{}".format(danji_id, room_type_id, level)
+
+    glTf_path = args.output or "{}/assets/glTF".format(path)
+    danji_path = '{}/{}'.format(glTf_path, danji_id)
+    room_path = '{}/{}'.format(danji_path, room_type_id)
+    createFolder(glTf_path)
+    createFolder(danji_path)
+    createFolder(room_path)
+
+    collection_generate = bpy.data.collections.new(model_name)
+    bpy.context.scene.collection.children.link(collection_generate)
+
+    collection_frame = bpy.data.collections.new("frame")
+    collection_furniture = bpy.data.collections.new("furnitures")
+    collection_window = bpy.data.collections.new("windows")
+    collection_door= bpy.data.collections.new("doors")
+    collection_light= bpy.data.collections.new("lights")
+
+    collection_generate.children.link(collection_frame)
+    collection_generate.children.link(collection_furniture)
+    collection_generate.children.link(collection_window)
+    collection_generate.children.link(collection_door)
+    collection_generate.children.link(collection_light)
+
+    #------------------------------------
+    # Generate Furnitures
+    trace.start("furniture")
+    placements = []
+    for furniture in dict["Furnitures"]:
+        name = furniture["name"]
+        type = furniture["type"]
+
+        obj = library.place(name)
+        if obj:
+            placements.append((obj, name))
+        else:
+            bpy.ops.mesh.primitive_cube_add()
+            obj = bpy.context.object
+
+        location, rotation, scale = ZigbangGeometry.furniture_placement(furniture, found=library.get(name) is not None)
+        obj.location = location
+        obj.rotation_euler = rotation
+        obj.scale = scale
+
+        obj.name = "{}_{}".format(name, uuid.uuid1())
+
+        if type == 0 :
+            collection_furniture.objects.link(obj)
+        elif type == 1:
+            collection_window.objects.link(obj)
+        elif type == 2:
+            collection_door.objects.link(obj)
+        elif not obj.users_collection:
+            bpy.context.scene.collection.objects.link(obj)
+
+    #------------------------------------
+    # Generate Wall & Floors   
+    for data in dict["WallAndFloors"]:
+        name = data["name"]
+
+        #if "Roof" in name:
+         #   continue
+
+        trace.start("frame.uv")
+        verts = ZigbangGeometry.to_array(data["vertices"], ("x", "y", "z"))
+        uvs = ZigbangGeometry.to_array(data["uv"], ("x", "y"))
+        triangles = ZigbangGeometry.to_triangles(data["triangles"])
+
+        # UVs per corner of the input triangles. solidified roofs and edges
+        # keep an empty layer
+        offset, thickness = ZigbangGeometry.frame_offset(name)
+        loop_uvs = None
+        if thickness is None:
+            loop_uvs = ZigbangGeometry.frame_uvs(name, verts, triangles, uvs)
+
+        # roofs and edge strips are thickened on the arrays, no operator,
+        # selection or depsgraph update involved
+        trace.start("frame.solidify")
+        co, loops = verts, triangles
+        if thickness is not None and len(triangles):
+            co, loops = ZigbangGeometry.solidify(verts, triangles, thickness)
+
+        # welded, without degenerate triangles, in vertex cache order
+        trace.start("frame.optimize")
+        if len(loops):
+            co, loops, loop_uvs = ZigbangGeometry.optimize_mesh(co, loops, loop_uvs)
+
+        trace.start("frame.mesh")
+        mesh = build_mesh(name, co, loops)
+
+        obj = bpy.data.objects.new(name, mesh)
+
+        material = library.material(name)
+        if material:
+           obj.active_material = material
+
+        obj.name = "{}_{}".format(obj.name,uuid.uuid1())
+
+        collection_frame.objects.link(obj)
+        obj.location = (0, offset, 0)
+
+        #------------------------------------
+        # Generate UV
+        me = obj.data
+        uvlayer = me.uv_layers.new(name=obj.name)
+        me.uv_layers.active = uvlayer
+
+        if loop_uvs is not None:
+            uvlayer.data.foreach_set("uv", loop_uvs.astype(np.float32).ravel())
+
+    # the input arrays are in the meshes now
+    del dict["WallAndFloors"]
+
+    #------------------------------------
+    # Center Positioning and 90 degree rotate (for Unity And Playfab .etc)
+    # as one matrix, applied in a single pass
+    trace.count(**scene_counts())
+    trace.start("transform")
+    bpy.context.view_layer.update()
+
+    meshes, mins, maxs = mesh_bounds(bpy.context.scene.objects)
+    offset = ZigbangGeometry.center_offset(*ZigbangGeometry.merge_bounds(mins, maxs), lift=3)
+    matrix = ZigbangGeometry.Y_UP_ROTATION @ ZigbangGeometry.translation(offset)
+    apply_matrix(bpy.context.scene.objects, matrix)
+
+    # the same boxes, moved along with the room
+    mins, maxs = ZigbangGeometry.transform_bounds(matrix, mins, maxs)
+
+    #------------------------------------
+    # Genderate Area Light
+    trace.start("lights")
+    for ob, low, high in zip(meshes, mins, maxs):
+        if ob.name.startswith("Floor") and not "Roof" in ob.name:
+           center = (low + high) / 2
+           size = high - low
+
+           bpy.ops.object.light_add(type='AREA', align='WORLD', location=(center[0], center[1], 200))
+           light = bpy.context.object
+           light.name = "Area.{}".format(ob.name)
+           light.data.shape = 'RECTANGLE'
+           light.data.energy = 5000
+           light.data.diffuse_factor = 100
+           light.data.specular_factor = 100
+           light.data.volume_factor = 100
+           light.data.size = size[0]
+           light.data.size_y = size[1]
+           collection_light.objects.link(bpy.context.object)
+
+    #------------------------------------
+    # Frame atlas, before the merge so atlas pieces end up in one mesh
+    if args.atlas:
+        trace.start("atlas")
+        trace.count(materials=atlas_frame(collection_frame, model_name))
+
+    #------------------------------------
+    # Merge frame pieces per material, after the lights took their floor sizes
+    if args.merge_frame:
+        trace.start("merge")
+        merge_frame(collection_frame)
+        trace.count(**scene_counts())
+
+    #------------------------------------
+    # Genderate Add Camera
+    trace.start("camera")
+    bpy.ops.object.camera_add(enter_editmode=False, align='VIEW', location=(0, 0, 3500), rotation=(0, -0, 0), scale=(1, 1, 1)) 
+    camera = bpy.context.object
+    bpy.context.scene.camera = camera
+    camera.data.lens = 75
+    camera.data.clip_end = 10000
+
+    #------------------------------------
+    # export glTF
+    output_path = '{}/{}.gltf'.format(room_path, model_name)
+    outputs = [output_path]
+    trace.start("textures")
+    published = publish_textures(path, bpy.context.scene.objects, args.quality)
+    sources = point_images(published)
+    try:
+        trace.start("export")
+        trace.count(**scene_counts())
+        options = ZigbangConfig.gltf_options(args.profile)
+        bpy.ops.export_scene.gltf(
+            filepath=output_path,
+            **options)
+
+        #------------------------------------
+        # Furniture LODs. <model>_LOD<n>.gltf next to the room, same scene with
+        # decimated furniture meshes (ZigbangConfig.LOD_RATIOS)
+        for lod, ratio in enumerate(ZigbangConfig.LOD_RATIOS[:args.lods], 1):
+            trace.start("lods")
+            for obj, name in placements:
+                obj.data = library.lod(name, ratio)
+            outputs.append('{}/{}_LOD{}.gltf'.format(room_path, model_name, lod))
+            bpy.ops.export_scene.gltf(
+                filepath=outputs[-1],
+                **options)
+    finally:
+        restore_images(sources)
+    for obj, name in placements:
+        obj.data = library.get(name).data
+    if args.bounded:
+        library.release_lods()
+        # pixels of file images reload from their source if needed
+        for image in published:
+            if image.has_data and image.filepath:
+                image.buffers_free()
+
+    # export_texture_dir
+    #------------------------------------
+    # Rendering, on the scene that was just exported
+    if args.render:
+        trace.start("render")
+        views = ZigbangGeometry.window_views(dict["WindowPoints"], matrix)
+        outputs += render_views(args.render, camera, views, room_path, model_name)
+
+    # every file of the export goes into the manifest, main glTF first
+    bins = [os.path.splitext(f)[0] + ".bin" for f in outputs if f.endswith(".gltf")]
+    outputs += [f for f in bins if os.path.exists(f)]
+    trace.stop()
+    return outputs
+
+#------------------------------------
+# Furniture assets for ZigbangGLTF.py. Every object of source.blend goes to
+# assets/furniture/<name>.gltf at the origin, the direct writer places them.
+def export_furniture(path, library, quality="full", profile=ZigbangConfig.DEFAULT_PROFILE):
+    furniture_path = "{}/assets/furniture".format(path)
+    createFolder(furniture_path)
+
+    with bpy.data.libraries.load(library.source_path, link=False) as (data_from, data_to):
+        names = list(data_from.objects)
+
+    for name in names:
+        library.reset()
+        obj = library.place(name)
+        if obj is None or obj.type != 'MESH':
+            continue
+
+        bpy.context.scene.collection.objects.link(obj)
+        obj.matrix_world = Matrix.Identity(4)
+
+        options = dict(ZigbangConfig.gltf_options(profile), export_cameras=False, export_lights=False)
+        sources = point_images(publish_textures(path, [obj], quality))
+        try:
+            bpy.ops.export_scene.gltf(
+                filepath='{}/{}.gltf'.format(furniture_path, name),
+                **options)
+        finally:
+            restore_images(sources)
+        print("furniture : {}".format(name))
+
+    clear()
+
+#------------------------------------
+# One input file. A status line, never an exception.
+def process(path, source_path, file_name, library, args, trace):
+    start = time.time()
+    trace.begin(file_name)
+    try:
+        key = ZigbangCache.cache_key(file_name, source_path, ZigbangConfig.export_options(args.quality, args.lods, args.merge_frame, args.profile, args.render, args.atlas))
+        # skipped inputs go through trace.end like the others
+        if not args.force and not args.output and ZigbangCache.is_current(path, file_name, key):
+            result = {"input": file_name, "status": "skipped"}
+        else:
+            trace.start("reset")
+            library.reset(full=args.reset == "full")
+            outputs = generate(path, file_name, library, args, trace)
+            # scratch exports (--output) stay out of the manifest
+            if not args.output:
+                ZigbangCache.record(path, file_name, key, outputs[0], outputs)
+            result = {"input": file_name, "status": "ok", "output": outputs[0]}
+    except Exception as e:
+        # one broken floorplan must not stop the rest of the batch
+        traceback.print_exc()
+        result = {"input": file_name, "status": "failed", "error": "{}: {}".format(type(e).__name__, e)}
+    result["seconds"] = round(time.time() - start, 3)
+
+    # --bounded : the room goes right away instead of at the next reset
+    if args.bounded:
+        trace.start("free")
+        clear(library.resident())
+        bpy.data.orphans_purge(do_local_ids=True, do_linked_ids=True, do_recursive=True)
+
+    # the library only shrinks when the process gets too big. no ceiling
+    # where the current size can not be read
+    memory = ZigbangTrace.memory_usage()
+    if args.memory_ceiling and memory is not None and memory > args.memory_ceiling:
+        trace.start("purge")
+        library.purge()
+        after = ZigbangTrace.memory_usage()
+        print("purged library : {:.0f}MB -> {:.0f}MB".format(memory, after))
+        # still too big, only a new process gives the memory back
+        if args.bounded and after > args.memory_ceiling:
+            result["recycle"] = True
+    if memory is not None:
+        result["memory"] = round(memory)
+    trace.end(result)
+    return result
+
+#------------------------------------
+# Resident worker (--watch). Jobs come from a ZigbangSpool folder, the
+# library stays loaded between them. Jobs may override JOB_OPTIONS. True
+# when the worker should be recycled.
+def watch(path, source_path, library, args, trace):
+    spool = args.watch
+    # the stop file is for every worker, only the operator removes it (resume)
+    if ZigbangSpool.stopped(spool):
+        print("stopped : {} (ZigbangSpool.py resume)".format(spool))
+        return False
+    for job_id in ZigbangSpool.recover(spool):
+        print("requeued : {}".format(job_id))
+    print("watching : {}".format(spool))
+
+    while not ZigbangSpool.stopped(spool):
+        job = ZigbangSpool.claim(spool)
+        if job is None:
+            time.sleep(args.poll)
+            continue
+
+        options = {k: v for k, v in job.get("options", {}).items() if k in ZigbangSpool.JOB_OPTIONS}
+        job_args = argparse.Namespace(**dict(vars(args), **options))
+        results = []
+        for file_name in job["inputs"]:
+            result = process(path, source_path, file_name, library, job_args, trace)
+            write_status(args.status, result)
+            results.append(result)
+        ZigbangSpool.complete(spool, job, results)
+
+        # the job is done, whoever started the worker starts a fresh one
+        if any(r.get("recycle") for r in results):
+            print("recycle : {:.0f}MB".format(ZigbangTrace.memory_usage()))
+            return True
+    return False
+
+#------------------------------------
+# Names of everything in source.blend for ZigbangPreflight.py
+def write_library_index(source_path, index_path):
+    with bpy.data.libraries.load(source_path, link=False) as (data_from, data_to):
+        index = {
+            "source_hash" : ZigbangCache.file_hash(source_path),
+            "objects" : sorted(data_from.objects),
+            "materials" : sorted(data_from.materials),
+        }
+    createFolder(os.path.dirname(os.path.abspath(index_path)))
+    with open(index_path, 'w') as file:
+        json.dump(index, file, indent=2, ensure_ascii=False)
+    print("library index : {} objects, {} materials -> {}".format(len(index["objects"]), len(index["materials"]), index_path))
+
+def execute(args):
     
     path = bpy.path.abspath("//")
     
     source_path = "{}/source/source.blend".format(path)
    
     input_path = "{}/inputs".format(path)
-    file_names = glob.glob("{}/*.json".format(input_path))
+    file_names = args.inputs or glob.glob("{}/*.json".format(input_path))
     
-    for file_name in file_names:
-         clear()
-        
-         with open(file_name, 'r') as file:
-             dict = json.load(file)
-         
-         danji_id = dict["DanjiId"]
-         room_type_id = dict["RoomTypeId"]
-         level = dict["Level"]
-         
-         #------------------------------------
-         # Generate Collections
-         model_name = "{}_{}_{}".format(danji_id, room_type_id, level)
-         
-         glTf_path = "{}/assets/glTF".format(path)
-         danji_path = '{}/{}'.format(glTf_path, danji_id)
-         room_path = '{}/{}'.format(danji_path, room_type_id)
-         createFolder(glTf_path)
-         createFolder(danji_path)
-         createFolder(room_path)
-             
-         collection_generate = bpy.data.collections.new(model_name)
-         bpy.context.scene.collection.children.link(collection_generate)
-        
-         collection_frame = bpy.data.collections.new("frame")
-         collection_furniture = bpy.data.collections.new("furnitures")
-         collection_window = bpy.data.collections.new("windows")
-         collection_door= bpy.data.collections.new("doors")
-         collection_light= bpy.data.collections.new("lights")
-         
-         collection_generate.children.link(collection_frame)
-         collection_generate.children.link(collection_furniture)
-         collection_generate.children.link(collection_window)
-         collection_generate.children.link(collection_door)
-         collection_generate.children.link(collection_light)
-        
-         #------------------------------------
-         # Generate Furnitures
-         for furniture in dict["Furnitures"]:
-             name = furniture["name"]
-             type = furniture["type"]
-            
-             position = furniture["position"]
-             px = round(position["x"], 2)
-             py = round(position["y"], 2) + 0.1
-             pz = round(position["z"], 2)
-            
-             rotation = furniture["rotation"]
-             rx = math.radians(round(rotation["x"]))
-             ry = math.radians(round(rotation["y"]))
-             rz = math.radians(round(rotation["z"]))
-            
-             scale = furniture["scale"]
-             sx = round(scale["x"], 2)
-             sy = round(scale["y"], 2)
-             sz = round(scale["z"], 2)
-                             
-             bpy.ops.wm.append(filepath = os.path.join(source_path, "Object", name), directory=os.path.join(source_path, "Object"), filename=name)
-             if bpy.data.objects.get(name):
-                 obj = bpy.data.objects[name]
-                 obj.location = (px, py, pz)
-                 obj.rotation_euler = (rx, ry, rz)
-                 obj.scale = (sx, sy, sz)
-             else:
-                 bpy.ops.mesh.primitive_cube_add()
-                 obj = bpy.context.object
-                 obj.location = (px, py + sy/2, pz)
-                 obj.rotation_euler = (rx, ry, rz)
-                 obj.scale = (sx/2, sy/2, sz/2)
-                 
-             obj.name = "{}_{}".format(name, uuid.uuid1())
-            
-             if type == 0 :
-                 collection_furniture.objects.link(obj)
-             elif type == 1:
-                 collection_window.objects.link(obj)
-             elif type == 2:
-                 collection_door.objects.link(obj)
-                 
-         #------------------------------------
-         # Generate Wall & Floors   
-         for data in dict["WallAndFloors"]:
-             name = data["name"]
-            
-             #if "Roof" in name:
-              #   continue
-            
-             vertices = data["vertices"]
-             verts = []
-             for v in vertices:
-                 vx = round(v["x"], 2)
-                 vy = round(v["y"], 2)
-                 vz = round(v["z"], 2)
-                 verts.append((vx, vy, vz))
-            
-             triangles = data["triangles"]
-            
-             edges = []
-             faces = []
-             for i in range(0, len(triangles), 3):
-                 faces.append(triangles[i:i+3])
-            
-             uv_datas = data["uv"]
-             uvs = []
-             for uv in uv_datas:
-                 ux = round(uv["x"],2)
-                 uy = round(uv["y"],2)
-                 uvs.append([ux, uy])
-             
-             mesh = bpy.data.meshes.new(name)  
-             mesh.from_pydata(verts, edges, faces)
-             mesh.calc_loop_triangles()
-             mesh.calc_normals_split()
-             mesh.update(calc_edges=True)
-             
-             
-             obj = bpy.data.objects.new(name, mesh)
-             
-             if not bpy.data.materials.get(name):
-                 bpy.ops.wm.append(filepath = os.path.join(source_path, "Material", name), directory=os.path.join(source_path, "Material"), filename=name)
-                 
-             if bpy.data.materials.get(name):
-                obj.active_material = bpy.data.materials[name]
-             
-             obj.name = "{}_{}".format(obj.name,uuid.uuid1())
-             
-             if name.startswith("Floor_"):
-                 collection_frame.objects.link(obj)
-                 if "Roof" in name:
-                     bpy.context.view_layer.objects.active = obj
-                     obj.select_set(True)
-                     obj.location = (0, -0.1, 0)
-                     bpy.ops.object.modifier_add(type='SOLIDIFY')
-                     bpy.context.object.modifiers["Solidify"].thickness = 50
-                     bpy.context.object.modifiers["Solidify"].offset = -1
-                     bpy.ops.object.convert(target='MESH')
-                     obj.select_set(False)
-                 else:
-                     obj.location = (0, 0.1, 0)
-             else:
-                 collection_frame.objects.link(obj)
-                 if "Edge_Top" in name:
-                     bpy.context.view_layer.objects.active = obj
-                     obj.select_set(True)
-                     obj.location = (0, -0.2, 0)
-                     bpy.ops.object.modifier_add(type='SOLIDIFY')
-                     bpy.context.object.modifiers["Solidify"].thickness = -3
-                     bpy.context.object.modifiers["Solidify"].offset = -1
-                     bpy.ops.object.convert(target='MESH')
-                     obj.select_set(False)
-                 if "Edge_Bottom" in name:
-                     bpy.context.view_layer.objects.active = obj
-                     obj.select_set(True)
-                     obj.location = (0, -0.1, 0)
-                     bpy.ops.object.modifier_add(type='SOLIDIFY')
-                     bpy.context.object.modifiers["Solidify"].thickness = -3
-                     bpy.context.object.modifiers["Solidify"].offset = -1
-                     bpy.ops.object.convert(target='MESH')
-                     obj.select_set(False)
-                    
-             
-             #------------------------------------
-             # Generate UV     
-             context = bpy.context
-             scene = context.scene
-             vl = context.view_layer
-             vl.objects.active = obj
-             
-             obj.select_set(True)
-             
-             ob = context.object
-             me = obj.data
-             
-             if len(obj.data.uv_layers) == 0:
-                     uvlayer = me.uv_layers.new(name=obj.name)
-                     me.uv_layers.active = uvlayer
-                     for tri in me.loop_triangles:
-                         if obj.name.startswith("Wall"):
-                             if "Bathroom" in obj.name or "Gate" in obj.name or "Balcony" in obj.name:
-                                 obj.location = (0, 1, 0)
-                                 for i in range(3):
-                                    vert_index = tri.vertices[i]
-                                    loop_index = tri.loops[i]
-                                    uvlayer.data[loop_index].uv = (uvs[vert_index][0], uvs[vert_index][1])                 
-                             else:
-                                 new_uvs = []
-                                 for i in range(3):
-                                     vert_index = tri.vertices[i]
-                                     vert = verts[vert_index]
-                                     new_uv = [0, 0]
-                                     if vert[1] == 0:
-                                         new_uv[1] = 0
-                                     else:
-                                         new_uv[1] = 1;
-                                     new_uvs.append(new_uv)
-
-                                 vert1 = verts[tri.vertices[0]]
-                                 vert2 = verts[tri.vertices[1]]
-                                 vert3 = verts[tri.vertices[2]]
-                                 
-                                 a = vert1[0] - vert2[0]
-                                 b = vert1[2] - vert2[2]
-                                 ver1to2_len = round(math.sqrt((a * a) + (b * b)))
-                                 
-                                 a = vert1[0] - vert3[0]
-                                 b = vert1[2] - vert3[2]
-                                 ver1to3_len = round(math.sqrt((a * a) + (b * b)))
-                                 
-                                 a = vert2[0] - vert3[0]
-                                 b = vert2[2] - vert3[2]
-                                 ver2to3_len = round(math.sqrt((a * a) + (b * b)))
-                                 
-                                 new_uvs[1][0] = ver1to2_len / 240
-                                 new_uvs[2][0] = ver1to3_len / 240
-                                 
-                                 for i in range(3):
-                                     loop_index = tri.loops[i]
-                                     uvlayer.data[loop_index].uv = (new_uvs[i][0], new_uvs[i][1])
-                                 
-                         elif len(uvs) != 0:
-                             for i in range(3):
-                                 vert_index = tri.vertices[i]
-                                 loop_index = tri.loops[i]
-                                 uvlayer.data[loop_index].uv = (uvs[vert_index][0], uvs[vert_index][1])
-         
-         #------------------------------------
-         # Center Positioning
-         bpy.ops.object.select_all(action='SELECT')
-         obj.select_set(True)
-        
-         bounds = merge_boxes(bpy.data.objects);
-         center = bounds.center
-         bpy.ops.transform.translate(value = (-center.x, 3, -center.z))
-         bpy.ops.object.transform_apply(location = True, rotation=True, scale=True)
-         
-         obj.select_set(False)
-         bpy.ops.object.select_all(action='DESELECT')
-         
-         #------------------------------------
-         # 90 degree rotate. for Unity And Playfab .etc
-         for ob in bpy.data.objects:
-             if ob.parent == None:
-                 ob.rotation_euler = (math.radians(90), 0, 0)
-         
-         bpy.ops.object.select_all(action='SELECT')
-         obj.select_set(True)
-         bpy.ops.object.transform_apply(location = True, rotation=True, scale=True)
-         obj.select_set(False)
-         bpy.ops.object.select_all(action='DESELECT')
-         
-         #------------------------------------
-         # Genderate Area Light
-         for ob in bpy.data.objects:
-             if ob.name.startswith("Floor") and not "Roof" in ob.name:
-                bounds = Box(ob)
-                center = bounds.center
-                size = bounds.max - bounds.min
-                
-                bpy.ops.object.light_add(type='AREA', align='WORLD', location=(center.x, center.y, 200))
-                light = bpy.context.object
-                light.name = "Area.{}".format(ob.name)
-                light.data.shape = 'RECTANGLE'
-                light.data.energy = 5000
-                light.data.diffuse_factor = 100
-                light.data.specular_factor = 100
-                light.data.volume_factor = 100
-                light.data.size = size.x
-                light.data.size_y = size.y
-                collection_light.objects.link(bpy.context.object)
-            
-         #------------------------------------
-         # Genderate Add Camera
-         bpy.ops.object.camera_add(enter_editmode=False, align='VIEW', location=(0, 0, 3500), rotation=(0, -0, 0), scale=(1, 1, 1)) 
-         camera = bpy.context.object
-         scene.camera = camera
-         camera.data.lens = 75
-         camera.data.clip_end = 10000
-         
-         #------------------------------------
-         # export glTF
-         bpy.ops.export_scene.gltf(
-         filepath='{}/{}.gltf'.format(room_path, model_name),
-         export_texture_dir='{}/assets/textures'.format(path),
-         
-         check_existing = True, 
-         export_format = 'GLTF_SEPARATE', 
-#         export_format = 'GLB',
-         export_image_format = 'JPEG', 
-         export_copyright = 'Zigbang',
-         
-         #------------------------------------
-         export_draco_mesh_compression_enable = True,
-#         export_draco_mesh_compression_level = 6,
-#         export_draco_position_quantization = 14,
-#         export_draco_normal_quantization = 10;
-#         export_draco_texcoord_quantization = 12,
-#         export_draco_color_quantization = 10,
-#         export_draco_generic_quantization = 12,
-
-         #------------------------------------
-#         export_keep_originals = False, 
-#         export_texcoords = True, 
-         export_normals = True,
-#         export_tangents = True,
-#         export_materials = 'EXPORT',
-#         export_original_specular = False,
-#         export_colors = True,
-#         use_mesh_edges = True,
-#         use_mesh_vertices = True,
-         
-         #------------------------------------
-         export_cameras = True,
-         export_animations = False,
-         export_frame_range = False,
-         export_force_sampling = False,
-         export_nla_strips = False,
-         export_def_bones = False,
-         export_optimize_animation_size = False,
-         export_anim_single_armature = False,
-         export_current_frame = False,
-         export_skins = False,
-         export_all_influences = False,
-         export_morph = False,
-         export_morph_normal = False,
-         export_morph_tangent = False,
-         export_lights = True)
-         
-         # export_texture_dir
-         #------------------------------------
-         # Rendering
-         render = bpy.context.scene.render;
-         render.resolution_x = 1280
-         render.resolution_y = 1280
-         render.filepath = '{}/{}.png'.format(room_path, model_name)
-         #bpy.ops.render.render(write_still = True)
-         
+    if args.library_index:
+        write_library_index(source_path, args.library_index)
+        return 0, False
+
+    library = SourceLibrary(source_path)
+    if args.export_furniture:
+        export_furniture(path, library, args.quality, args.profile)
+        return 0, False
+
+    trace = ZigbangTrace.Trace(args.trace, args.chrome_trace, datablock_memory if args.bounded else None)
+    # failures are counted, recycle is the separate exit 75 signal
+    failed, recycle = 0, False
+    if args.watch:
+        recycle = watch(path, source_path, library, args, trace)
+    else:
+        for i, file_name in enumerate(file_names):
+            result = process(path, source_path, file_name, library, args, trace)
+            write_status(args.status, result)
+            failed += result["status"] == "failed"
+
+            # hand the rest back to the batch driver, it starts a new process for them
+            if result.get("recycle") and i + 1 < len(file_names):
+                for rest in file_names[i + 1:]:
+                    write_status(args.status, {"input": rest, "status": "recycle", "memory": result.get("memory")})
+                recycle = True
+                break
+
+    trace.close()
     clear()
-    return 0
+    return failed, recycle
+
+#------------------------------------
+# Arguments. Everything after "--" on the blender command line belongs to this script.
+#   blender --background workspace.blend --python ZigbangExporter.py -- [--status <file>] [inputs ...]
+def parse_args():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(prog="ZigbangExporter")
+    parser.add_argument("inputs", nargs="*", help="floorplan .json or .zfp files. default: inputs/*.json")
+    parser.add_argument("--status", help="append one JSON line per processed input to this file")
+    parser.add_argument("--force", action="store_true", help="export even if the manifest says the output is current")
+    parser.add_argument("--profile", choices=list(ZigbangConfig.load_profiles()), default=ZigbangConfig.DEFAULT_PROFILE,
+                        help="draco settings from config/export_profiles.json")
+    parser.add_argument("--output", help="write rooms under this folder instead of assets/glTF, without the manifest")
+    parser.add_argument("--quality", choices=list(ZigbangConfig.TEXTURE_TIERS), default="full",
+                        help="texture tier, longest side of every texture (ZigbangConfig.TEXTURE_TIERS)")
+    parser.add_argument("--lods", type=int, default=0, choices=range(len(ZigbangConfig.LOD_RATIOS) + 1),
+                        help="furniture LOD files written next to every room (<model>_LOD<n>.gltf)")
+    parser.add_argument("--merge-frame", action="store_true", help="join frame pieces per material into one mesh")
+    parser.add_argument("--atlas", action="store_true", help="pack frame textures whose uvs do not repeat into one atlas material")
+    parser.add_argument("--render", choices=list(ZigbangConfig.RENDER_PRESETS),
+                        help="render <model>.png from the top and <model>_view<n>.png from every window point")
+    parser.add_argument("--trace", help="append per stage timings of every input to this JSON lines file")
+    parser.add_argument("--chrome-trace", help="write every stage as a chrome://tracing event to this file")
+    parser.add_argument("--reset", choices=["library", "full"], default="library",
+                        help="between rooms drop only the room (library) or the source library as well (full)")
+    parser.add_argument("--memory-ceiling", type=float, default=ZigbangConfig.MEMORY_CEILING_MB,
+                        help="MB. above it unused library datablocks are purged, 0 = never")
+    parser.add_argument("--bounded", action="store_true",
+                        help="free every room right after its export, trace datablock memory and exit with {} "
+                             "when the memory ceiling is still exceeded after a purge".format(ZigbangConfig.RECYCLE_EXIT_CODE))
+    parser.add_argument("--watch", help="stay resident and take jobs from this ZigbangSpool folder")
+    parser.add_argument("--poll", type=float, default=0.2, help="seconds between spool checks with --watch")
+    parser.add_argument("--library-index", help="write the object / material names of source.blend to this JSON file for ZigbangPreflight.py")
+    parser.add_argument("--export-furniture", action="store_true", help="export every source.blend object to assets/furniture for ZigbangGLTF.py")
+    return parser.parse_args(argv)
 
 #------------------------------------
 
-execute()
\ No newline at end of file
+failed, recycle = execute(parse_args())
+if recycle:
+    sys.exit(ZigbangConfig.RECYCLE_EXIT_CODE)
\ No newline at end of file
@@ -0,0 +1,355 @@
+#------------------------------------
+# Direct glTF writer. Builds the room shell without blender.
+#
+#   python scripts/ZigbangGLTF.py [--glb] [--force] [--quality <tier>] [--merge-frame] [inputs ...]
+#
+# Frame pieces go through the same ZigbangGeometry steps as the blender
+# path (rounding, offsets, solidify, wall UVs, centering) and are written
+# as NumPy packed buffers. Furniture is not rebuilt : every placement is a
+# node whose matrix places the pre-exported asset
+# assets/furniture/<name>.gltf (ZigbangExporter.py -- --export-furniture),
+# the asset uri is in the node extras. Furniture without an asset becomes
+# the same cube the blender path adds.
+#
+# Materials are named like the source.blend materials, textures come from
+# config/materials.json and are shared through ZigbangTextures. Output lands where the blender path writes it,
+# assets/glTF/<danji>/<room>/<model>.gltf. No draco here.
+
+import argparse
+import glob
+import json
+import os
+import struct
+import sys
+import time
+import traceback
+from urllib.parse import quote
+
+import numpy as np
+
+import ZigbangBinary
+import ZigbangCache
+import ZigbangConfig
+import ZigbangGeometry
+import ZigbangTextures
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# blender camera at (0, 0, 3500) looking down, lens 75 on a 36mm sensor
+CAMERA_HEIGHT = 3500
+CAMERA_YFOV = 2 * np.arctan(18 / 75)
+CAMERA_ROTATION = [-np.sqrt(0.5), 0, 0, np.sqrt(0.5)]
+
+def options(glb=False, quality="full", merge_frame=False):
+    return {"writer" : "direct", "glb" : glb, "texture_quality" : quality, "merge_frame" : merge_frame}
+
+# the writer embeds more than the input : materials.json and the furniture
+# assets the room places (None while an asset is missing, the cube)
+def dependencies(floorplan, root=root_path):
+    furniture_path = os.path.join(root, "assets", "furniture")
+    names = sorted({f["name"] for f in floorplan["Furnitures"]})
+    return {"materials" : ZigbangCache.file_hash(os.path.join(root, "config", "materials.json")),
+            "furniture" : {name : ZigbangCache.file_hash(os.path.join(furniture_path, "{}.gltf".format(name))) for name in names}}
+
+def room_key(file_name, floorplan, glb=False, quality="full", merge_frame=False, root=root_path):
+    source_path = os.path.join(root, "source", "source.blend")
+    return ZigbangCache.cache_key(file_name, source_path, dict(options(glb, quality, merge_frame), **dependencies(floorplan, root)))
+
+def uri(target_path, base_path):
+    return quote(os.path.relpath(target_path, base_path).replace(os.sep, "/"))
+
+def load_materials():
+    with open(os.path.join(root_path, "config", "materials.json"), 'r') as file:
+        return json.load(file)
+
+#------------------------------------
+# glTF document with one binary buffer
+class Document:
+    def __init__(self, quality="full"):
+        self.gltf = {
+            "asset" : {"version" : "2.0", "generator" : "Zigbang direct writer", "copyright" : "Zigbang"},
+            "scene" : 0,
+            "scenes" : [{"nodes" : []}],
+            "nodes" : [],
+            "meshes" : [],
+            "accessors" : [],
+            "bufferViews" : [],
+            "buffers" : [],
+        }
+        self.blobs = []
+        self.length = 0
+        self.materials = {}
+        self.images = {}
+        self.textures = {}
+        self.texture_size = ZigbangConfig.TEXTURE_TIERS[quality]
+        self.cube = None
+
+    def add(self, key, item):
+        self.gltf.setdefault(key, []).append(item)
+        return len(self.gltf[key]) - 1
+
+    def view(self, array, target=None):
+        raw = np.ascontiguousarray(array).tobytes()
+        view = {"buffer" : 0, "byteOffset" : self.length, "byteLength" : len(raw)}
+        if target:
+            view["target"] = target
+        self.blobs.append(raw + b"\0" * ((4 - len(raw) % 4) % 4))
+        self.length += len(self.blobs[-1])
+        return self.add("bufferViews", view)
+
+    def accessor(self, array, type, target=34962, bounds=False):
+        component = {np.dtype(np.float32) : 5126, np.dtype(np.uint32) : 5125, np.dtype(np.uint16) : 5123}[array.dtype]
+        accessor = {
+            "bufferView" : self.view(array, target),
+            "componentType" : component,
+            "count" : len(array),
+            "type" : type,
+        }
+        if bounds:
+            accessor["min"] = array.min(axis=0).tolist()
+            accessor["max"] = array.max(axis=0).tolist()
+        return self.add("accessors", accessor)
+
+    def mesh(self, name, positions, normals, uvs, indices, material=None):
+        indices = indices.astype(np.uint16 if len(positions) < 65536 else np.uint32)
+        primitive = {
+            "attributes" : {
+                "POSITION" : self.accessor(positions, "VEC3", bounds=True),
+                "NORMAL" : self.accessor(normals, "VEC3"),
+                "TEXCOORD_0" : self.accessor(uvs, "VEC2"),
+            },
+            "indices" : self.accessor(indices, "SCALAR", target=34963),
+        }
+        if material is not None:
+            primitive["material"] = material
+        return self.add("meshes", {"name" : name, "primitives" : [primitive]})
+
+    def node(self, node, root=True):
+        index = self.add("nodes", node)
+        if root:
+            self.gltf["scenes"][0]["nodes"].append(index)
+        return index
+
+    def texture(self, image_path, base_path):
+        if not image_path in self.images:
+            if not "samplers" in self.gltf:
+                self.add("samplers", {"magFilter" : 9729, "minFilter" : 9987, "wrapS" : 10497, "wrapT" : 10497})
+            published = ZigbangTextures.publish(image_path, self.textures, size=self.texture_size)
+            image = self.add("images", {"uri" : uri(published, base_path)})
+            self.images[image_path] = self.add("textures", {"sampler" : 0, "source" : image})
+        return self.images[image_path]
+
+    def material(self, name, materials, base_path):
+        if not name in self.materials:
+            material = {"name" : name, "pbrMetallicRoughness" : {"metallicFactor" : 0, "roughnessFactor" : 0.5}}
+            textures = materials.get(name, {})
+            if "baseColorTexture" in textures:
+                material["pbrMetallicRoughness"]["baseColorTexture"] = {
+                    "index" : self.texture(os.path.join(root_path, "source", "textures", textures["baseColorTexture"]), base_path)}
+            if "normalTexture" in textures:
+                material["normalTexture"] = {
+                    "index" : self.texture(os.path.join(root_path, "source", "textures", textures["normalTexture"]), base_path)}
+            self.materials[name] = self.add("materials", material)
+        return self.materials[name]
+
+    # returns the files written
+    def write(self, output_path, glb=False):
+        binary = b"".join(self.blobs)
+        self.gltf["buffers"] = [{"byteLength" : len(binary)}] if binary else []
+        for key in ["meshes", "accessors", "bufferViews", "buffers"]:
+            if self.gltf[key] == []:
+                del self.gltf[key]
+
+        if glb:
+            raw = json.dumps(self.gltf, ensure_ascii=False).encode("utf-8")
+            raw += b" " * ((4 - len(raw) % 4) % 4)
+            with open(output_path, 'wb') as file:
+                file.write(struct.pack("<III", 0x46546C67, 2, 12 + 8 + len(raw) + 8 + len(binary)))
+                file.write(struct.pack("<II", len(raw), 0x4E4F534A))
+                file.write(raw)
+                file.write(struct.pack("<II", len(binary), 0x004E4942))
+                file.write(binary)
+            return [output_path]
+        else:
+            if binary:
+                bin_path = os.path.splitext(output_path)[0] + ".bin"
+                self.gltf["buffers"][0]["uri"] = quote(os.path.basename(bin_path))
+                with open(bin_path, 'wb') as file:
+                    file.write(binary)
+            with open(output_path, 'w') as file:
+                json.dump(self.gltf, file, ensure_ascii=False)
+            return [output_path, bin_path] if binary else [output_path]
+
+#------------------------------------
+# Frame piece -> indexed primitive. Corners are split per face like the
+# blender exporter does for flat shading, then identical corners are merged.
+def frame_piece(data):
+    name = data["name"]
+    co = ZigbangGeometry.to_array(data["vertices"], ("x", "y", "z"))
+    uvs = ZigbangGeometry.to_array(data["uv"], ("x", "y"))
+    triangles = ZigbangGeometry.to_triangles(data["triangles"])
+
+    offset, thickness = ZigbangGeometry.frame_offset(name)
+    loop_uvs = None
+    if thickness is None:
+        loop_uvs = ZigbangGeometry.frame_uvs(name, co, triangles, uvs)
+    elif len(triangles):
+        co, triangles = ZigbangGeometry.solidify(co, triangles, thickness)
+
+    return name, co + (0, offset, 0), triangles, loop_uvs
+
+def primitive(co, triangles, loop_uvs):
+    normals = np.repeat(ZigbangGeometry.face_normals(co, triangles), 3, axis=0)
+    corners = co[np.asarray(triangles, dtype=np.int64)]
+    if loop_uvs is None:
+        loop_uvs = np.zeros((len(corners), 2))
+
+    # glTF has v pointing down
+    uv = np.column_stack([loop_uvs[:, 0], 1 - loop_uvs[:, 1]])
+    # welded where position, normal and uv match, then in vertex cache order
+    attributes = np.hstack([corners, normals, uv]).astype(np.float32)
+    unique, inverse = np.unique(attributes, axis=0, return_inverse=True)
+    indices, _ = ZigbangGeometry.strip_degenerate(unique[:, 0:3], inverse.ravel())
+    order = ZigbangGeometry.tipsify(indices, len(unique))
+    unique, indices = ZigbangGeometry.first_use_order(unique, indices.reshape(-1, 3)[order])
+
+    return (np.ascontiguousarray(unique[:, 0:3]), np.ascontiguousarray(unique[:, 3:6]),
+            np.ascontiguousarray(unique[:, 6:8]), indices)
+
+#------------------------------------
+# Furniture assets
+_asset_bounds = {}
+
+def asset_bounds(asset_path):
+    # POSITION min / max of the asset, in glTF space
+    if not asset_path in _asset_bounds:
+        with open(asset_path, 'r') as file:
+            asset = json.load(file)
+        points = []
+        for mesh in asset.get("meshes", []):
+            for prim in mesh["primitives"]:
+                accessor = asset["accessors"][prim["attributes"]["POSITION"]]
+                points += [accessor["min"], accessor["max"]]
+        _asset_bounds[asset_path] = (np.min(points, axis=0), np.max(points, axis=0)) if points else None
+    return _asset_bounds[asset_path]
+
+def furniture_nodes(floorplan, furniture_path):
+    nodes = []
+    for i, furniture in enumerate(floorplan["Furnitures"]):
+        name = furniture["name"]
+        asset_path = os.path.join(furniture_path, "{}.gltf".format(name))
+        found = os.path.exists(asset_path)
+
+        location, rotation, scale = ZigbangGeometry.furniture_placement(furniture, found)
+        # assets are stored y-up, the placement is in blender space of the input
+        matrix = ZigbangGeometry.trs_matrix(location, rotation, scale) @ ZigbangGeometry.Y_UP_ROTATION
+
+        bounds = asset_bounds(asset_path) if found else (-np.ones(3), np.ones(3))
+        corners = ZigbangGeometry.transform_points(matrix, ZigbangGeometry.box_corners(*bounds)) if bounds else np.zeros((0, 3))
+        nodes.append((name, i, found, asset_path, matrix, corners))
+    return nodes
+
+def cube(document):
+    # blender's 2m cube, symmetric so the y-up turn of the node does not matter
+    if document.cube is None:
+        co = ZigbangGeometry.box_corners(-np.ones(3), np.ones(3))
+        faces = np.array([[0, 1, 3], [0, 3, 2], [4, 6, 7], [4, 7, 5], [0, 4, 5], [0, 5, 1],
+                          [2, 3, 7], [2, 7, 6], [0, 2, 6], [0, 6, 4], [1, 5, 7], [1, 7, 3]]).ravel()
+        document.cube = document.mesh("Cube", *primitive(co, faces, None))
+    return document.cube
+
+#------------------------------------
+# Room
+def merge_by_material(pieces):
+    # materials follow the piece name, one piece per name
+    groups = {}
+    for name, co, triangles, loop_uvs in pieces:
+        if len(triangles):
+            groups.setdefault(name, []).append((co, triangles, loop_uvs))
+    return [(name,) + ZigbangGeometry.merge_pieces(group) for name, group in groups.items()]
+
+def build(floorplan, output_path, furniture_path, materials, quality="full", merge_frame=False):
+    document = Document(quality)
+    base_path = os.path.dirname(output_path)
+
+    pieces = [frame_piece(data) for data in floorplan["WallAndFloors"]]
+    if merge_frame:
+        pieces = merge_by_material(pieces)
+    furnitures = furniture_nodes(floorplan, furniture_path)
+
+    points = [co for name, co, triangles, loop_uvs in pieces if len(co)] + [f[5] for f in furnitures if len(f[5])]
+    mins = np.min([p.min(axis=0) for p in points], axis=0)
+    maxs = np.max([p.max(axis=0) for p in points], axis=0)
+    offset = ZigbangGeometry.center_offset(mins, maxs, lift=3)
+
+    for i, (name, co, triangles, loop_uvs) in enumerate(pieces):
+        if not len(triangles):
+            continue
+        mesh = document.mesh(name, *primitive(co + offset, triangles, loop_uvs),
+                             material=document.material(name, materials, base_path))
+        document.node({"name" : "{}_{}".format(name, i), "mesh" : mesh})
+
+    for name, i, found, asset_path, matrix, corners in furnitures:
+        matrix = ZigbangGeometry.translation(offset) @ matrix
+        node = {"name" : "{}_{}".format(name, i), "matrix" : matrix.T.ravel().tolist()}
+        if found:
+            node["extras"] = {"asset" : uri(asset_path, base_path)}
+        else:
+            node["mesh"] = cube(document)
+        document.node(node)
+
+    camera = document.add("cameras", {"type" : "perspective", "perspective" : {
+        "aspectRatio" : 1.0, "yfov" : float(CAMERA_YFOV), "znear" : 0.1, "zfar" : 10000}})
+    document.node({"name" : "Camera", "camera" : camera,
+                   "translation" : [0, CAMERA_HEIGHT, 0], "rotation" : [float(r) for r in CAMERA_ROTATION]})
+
+    return document
+
+def export_file(file_name, glb=False, force=False, quality="full", merge_frame=False):
+    start = time.time()
+    try:
+        floorplan = ZigbangBinary.load(file_name)
+        key = room_key(file_name, floorplan, glb, quality, merge_frame)
+        if not force and ZigbangCache.is_current(root_path, file_name, key):
+            return {"input" : file_name, "status" : "skipped", "seconds" : 0}
+
+        model_name = "{}_{}_{}".format(floorplan["DanjiId"], floorplan["RoomTypeId"], floorplan["Level"])
+        room_path = os.path.join(root_path, "assets", "glTF", str(floorplan["DanjiId"]), str(floorplan["RoomTypeId"]))
+        os.makedirs(room_path, exist_ok=True)
+
+        output_path = os.path.join(room_path, "{}.{}".format(model_name, "glb" if glb else "gltf"))
+        document = build(floorplan, output_path, os.path.join(root_path, "assets", "furniture"), load_materials(), quality, merge_frame)
+        outputs = document.write(output_path, glb)
+        ZigbangTextures.update_index(document.textures)
+
+        ZigbangCache.record(root_path, file_name, key, output_path, outputs)
+        result = {"input" : file_name, "status" : "ok"}
+    except Exception as e:
+        traceback.print_exc()
+        result = {"input" : file_name, "status" : "failed", "error" : "{}: {}".format(type(e).__name__, e)}
+
+    result["seconds"] = round(time.time() - start, 3)
+    return result
+
+def export_files(file_names, glb=False, force=False, quality="full", merge_frame=False):
+    return {file_name : export_file(file_name, glb, force, quality, merge_frame) for file_name in file_names}
+
+def main():
+    parser = argparse.ArgumentParser(prog="ZigbangGLTF")
+    parser.add_argument("inputs", nargs="*", help="floorplan .json or .zfp files. default: inputs/*.json")
+    parser.add_argument("--glb", action="store_true", help="write one .glb instead of .gltf + .bin")
+    parser.add_argument("--force", action="store_true")
+    parser.add_argument("--quality", choices=list(ZigbangConfig.TEXTURE_TIERS), default="full")
+    parser.add_argument("--merge-frame", action="store_true", help="one primitive per frame material")
+    args = parser.parse_args()
+
+    file_names = args.inputs or glob.glob(os.path.join(root_path, "inputs", "*.json"))
+    failed = 0
+    for file_name in file_names:
+        result = export_file(os.path.abspath(file_name), args.glb, args.force, args.quality, args.merge_frame)
+        print(json.dumps(result))
+        failed += result["status"] == "failed"
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
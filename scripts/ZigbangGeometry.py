@@ -0,0 +1,366 @@
+#------------------------------------
+# Geometry core. Floorplan JSON -> arrays, shared by ZigbangExporter.py,
+# ZigbangLibrary.py and the benchmarks. numpy only, no bpy, so everything
+# here runs under plain CPython.
+
+import math
+
+import numpy as np
+
+#------------------------------------
+# Input arrays
+def to_array(points, keys, decimals=2):
+    # .zfp inputs already hold flat buffers
+    if isinstance(points, np.ndarray):
+        return np.round(points.astype(np.float64), decimals)
+    array = np.fromiter((p[k] for p in points for k in keys), dtype=np.float64, count=len(points) * len(keys))
+    return np.round(array.reshape(-1, len(keys)), decimals)
+
+def to_triangles(triangles):
+    return np.asarray(triangles, dtype=np.int32)
+
+#------------------------------------
+# Furniture placement. Missing library objects become a cube standing on the floor.
+def furniture_placement(furniture, found=True):
+    position = furniture["position"]
+    px = round(position["x"], 2)
+    py = round(position["y"], 2) + 0.1
+    pz = round(position["z"], 2)
+
+    rotation = furniture["rotation"]
+    rx = math.radians(round(rotation["x"]))
+    ry = math.radians(round(rotation["y"]))
+    rz = math.radians(round(rotation["z"]))
+
+    scale = furniture["scale"]
+    sx = round(scale["x"], 2)
+    sy = round(scale["y"], 2)
+    sz = round(scale["z"], 2)
+
+    if found:
+        return (px, py, pz), (rx, ry, rz), (sx, sy, sz)
+    return (px, py + sy/2, pz), (rx, ry, rz), (sx/2, sy/2, sz/2)
+
+#------------------------------------
+# Frame pieces. y offset of the object and solidify thickness (None = flat).
+def is_copied_wall(name):
+    return "Bathroom" in name or "Gate" in name or "Balcony" in name
+
+def frame_offset(name):
+    if name.startswith("Floor_"):
+        if "Roof" in name:
+            return -0.1, 50
+        return 0.1, None
+    if "Edge_Top" in name:
+        return -0.2, -3
+    if "Edge_Bottom" in name:
+        return -0.1, -3
+    if name.startswith("Wall") and is_copied_wall(name):
+        return 1, None
+    return 0, None
+
+#------------------------------------
+# Frame UV. Every polygon is one input triangle, so loop i belongs to
+# vertex triangles[i] and all loops are computed at once.
+#   Wall_Bathroom / Wall_Gate / Wall_Balcony : input uvs
+#   other walls : u = xz distance from the first corner / 240,
+#                 v = 0 on the floor else 1 (tile_height : y / 240)
+#   everything else : input uvs if there are any
+def frame_uvs(name, co, triangles, uvs, tile_height=False):
+    loops = np.asarray(triangles, dtype=np.int64)
+
+    if name.startswith("Wall") and not is_copied_wall(name):
+        corners = co[loops].reshape(-1, 3, 3)
+
+        loop_uvs = np.zeros((len(corners), 3, 2))
+        if tile_height:
+            loop_uvs[:, :, 1] = corners[:, :, 1] / 240
+        else:
+            loop_uvs[:, :, 1] = np.where(corners[:, :, 1] == 0, 0, 1)
+
+        a = corners[:, 0, 0] - corners[:, 1, 0]
+        b = corners[:, 0, 2] - corners[:, 1, 2]
+        loop_uvs[:, 1, 0] = np.rint(np.sqrt((a * a) + (b * b))) / 240
+
+        a = corners[:, 0, 0] - corners[:, 2, 0]
+        b = corners[:, 0, 2] - corners[:, 2, 2]
+        loop_uvs[:, 2, 0] = np.rint(np.sqrt((a * a) + (b * b))) / 240
+
+        return loop_uvs.reshape(-1, 2)
+
+    if name.startswith("Wall") or len(uvs) != 0:
+        return uvs[loops]
+
+    return None
+
+#------------------------------------
+# Merge. Pieces (co, triangles, loop uvs or None) sharing a material become
+# one piece, triangle indices move by the vertex count of the pieces before.
+def merge_pieces(pieces):
+    co = [np.asarray(piece[0], dtype=np.float64).reshape(-1, 3) for piece in pieces]
+    triangles = [np.asarray(piece[1], dtype=np.int64).ravel() for piece in pieces]
+    starts = np.cumsum([0] + [len(c) for c in co[:-1]])
+
+    merged_uvs = None
+    if any(piece[2] is not None for piece in pieces):
+        merged_uvs = np.concatenate([np.zeros((len(t), 2)) if piece[2] is None else np.asarray(piece[2], dtype=np.float64)
+                                     for piece, t in zip(pieces, triangles)])
+
+    merged = np.concatenate([t + start for t, start in zip(triangles, starts)]).astype(np.int32)
+    return np.concatenate(co), merged, merged_uvs
+
+#------------------------------------
+# Mesh optimization before export
+#   weld            : coincident positions become one vertex. UVs stay per
+#                     corner and frame faces are flat, so nothing visible moves
+#   strip_degenerate: triangles using a vertex twice or without area
+#   tipsify         : triangle order for the post transform cache
+#                     (Sander, Nehab, Barczak 2007)
+#   first_use_order : vertices in the order the index buffer reads them
+def weld(co, triangles):
+    unique, inverse = np.unique(np.asarray(co), axis=0, return_inverse=True)
+    return unique, inverse.ravel()[np.asarray(triangles, dtype=np.int64).ravel()].astype(np.int32)
+
+def strip_degenerate(co, triangles, loop_uvs=None):
+    loops = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+    area = np.linalg.norm(face_normals(co, loops, normalize=False), axis=1)
+    keep = (loops[:, 0] != loops[:, 1]) & (loops[:, 1] != loops[:, 2]) & (loops[:, 2] != loops[:, 0]) & (area > 0)
+    if loop_uvs is not None:
+        loop_uvs = np.asarray(loop_uvs).reshape(-1, 3, 2)[keep].reshape(-1, 2)
+    return loops[keep].ravel().astype(np.int32), loop_uvs
+
+def tipsify(triangles, vertex_count, cache_size=16):
+    # returns the new order of the triangles
+    loops = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+    flat = loops.ravel()
+    counts = np.bincount(flat, minlength=vertex_count)
+    offsets = np.concatenate([[0], np.cumsum(counts)]).tolist()
+    adjacency = (np.argsort(flat, kind='stable') // 3).tolist()
+    loops = loops.tolist()
+
+    live = counts.tolist()
+    stamp = [0] * vertex_count
+    emitted = bytearray(len(loops))
+    dead_end = []
+    order = []
+    time = cache_size + 1
+    cursor = 0
+
+    fan = 0
+    while fan < vertex_count and live[fan] == 0:
+        fan += 1
+
+    while fan < vertex_count:
+        candidates = []
+        for t in adjacency[offsets[fan]:offsets[fan + 1]]:
+            if emitted[t]:
+                continue
+            emitted[t] = 1
+            order.append(t)
+            for v in loops[t]:
+                dead_end.append(v)
+                candidates.append(v)
+                live[v] -= 1
+                if time - stamp[v] > cache_size:
+                    stamp[v] = time
+                    time += 1
+
+        # most recently cached candidate that still has triangles
+        fan, best = -1, -1
+        for v in candidates:
+            if live[v] > 0:
+                priority = time - stamp[v] if time - stamp[v] + 2 * live[v] <= cache_size else 0
+                if priority > best:
+                    fan, best = v, priority
+
+        if fan == -1:
+            while dead_end:
+                v = dead_end.pop()
+                if live[v] > 0:
+                    fan = v
+                    break
+        if fan == -1:
+            while cursor < vertex_count and live[cursor] == 0:
+                cursor += 1
+            fan = cursor
+
+    return np.array(order, dtype=np.int64)
+
+def first_use_order(co, triangles):
+    flat = np.asarray(triangles, dtype=np.int64).ravel()
+    _, first = np.unique(flat, return_index=True)
+    used = flat[np.sort(first)]
+    remap = np.full(len(co), -1, dtype=np.int64)
+    remap[used] = np.arange(len(used))
+    return co[used], remap[flat].astype(np.int32)
+
+def acmr(triangles, cache_size=16):
+    # average cache miss ratio of a FIFO cache, 0.5 .. 3
+    cache = []
+    misses = 0
+    for v in np.asarray(triangles).ravel().tolist():
+        if not v in cache:
+            misses += 1
+            cache.append(v)
+            if len(cache) > cache_size:
+                cache.pop(0)
+    return misses / max(1, len(np.ravel(triangles)) // 3)
+
+def optimize_mesh(co, triangles, loop_uvs=None, cache_size=16):
+    co, triangles = weld(co, triangles)
+    triangles, loop_uvs = strip_degenerate(co, triangles, loop_uvs)
+    order = tipsify(triangles, len(co), cache_size)
+    triangles = np.asarray(triangles).reshape(-1, 3)[order]
+    if loop_uvs is not None:
+        loop_uvs = loop_uvs.reshape(-1, 3, 2)[order].reshape(-1, 2)
+    co, triangles = first_use_order(co, triangles)
+    return co, triangles, loop_uvs
+
+#------------------------------------
+# Transforms. 4x4 matrices act on column vectors like mathutils.
+# Y_UP_ROTATION turns the unity Y-up data into blender Z-up, the glTF
+# exporter turns it back.
+Y_UP_ROTATION = np.array([
+    [1, 0, 0, 0],
+    [0, 0, -1, 0],
+    [0, 1, 0, 0],
+    [0, 0, 0, 1]], dtype=np.float64)
+
+def translation(offset):
+    matrix = np.identity(4)
+    matrix[:3, 3] = offset
+    return matrix
+
+def euler_matrix(rotation):
+    # blender 'XYZ' euler : x is applied first
+    rx, ry, rz = rotation
+    cx, sx = math.cos(rx), math.sin(rx)
+    cy, sy = math.cos(ry), math.sin(ry)
+    cz, sz = math.cos(rz), math.sin(rz)
+    x = np.array([[1, 0, 0], [0, cx, -sx], [0, sx, cx]])
+    y = np.array([[cy, 0, sy], [0, 1, 0], [-sy, 0, cy]])
+    z = np.array([[cz, -sz, 0], [sz, cz, 0], [0, 0, 1]])
+    matrix = np.identity(4)
+    matrix[:3, :3] = z @ y @ x
+    return matrix
+
+def trs_matrix(location, rotation, scale):
+    matrix = euler_matrix(rotation)
+    matrix[:3, :3] = matrix[:3, :3] * np.asarray(scale, dtype=np.float64)
+    matrix[:3, 3] = location
+    return matrix
+
+def transform_points(matrix, co):
+    return co @ matrix[:3, :3].T + matrix[:3, 3]
+
+#------------------------------------
+# Centering. The room is moved so its bound box center sits on x = z = 0
+# and lifted by `lift` on y.
+def bounds(co):
+    return co.min(axis=0), co.max(axis=0)
+
+# Axis aligned boxes are (mins, maxs) arrays, one row per object.
+def box_corners(mins, maxs):
+    mins = np.asarray(mins, dtype=np.float64)
+    maxs = np.asarray(maxs, dtype=np.float64)
+    pick = np.array([[x, y, z] for x in (0, 1) for y in (0, 1) for z in (0, 1)], dtype=bool)
+    return np.where(pick, maxs[..., None, :], mins[..., None, :])
+
+def object_bounds(corners, matrices):
+    # corners (n, 8, 3) local bound boxes, matrices (n, 4, 4) world matrices
+    world = np.einsum('nij,nkj->nki', matrices[:, :3, :3], corners) + matrices[:, None, :3, 3]
+    return world.min(axis=1), world.max(axis=1)
+
+def transform_bounds(matrix, mins, maxs):
+    world = transform_points(matrix, box_corners(mins, maxs))
+    return world.min(axis=-2), world.max(axis=-2)
+
+def merge_bounds(mins, maxs):
+    return mins.min(axis=0), maxs.max(axis=0)
+
+def center_offset(mins, maxs, lift=3):
+    center = (np.asarray(mins) + np.asarray(maxs)) / 2
+    return np.array([-center[0], lift, -center[2]])
+
+#------------------------------------
+# Cameras. Blender cameras look down their local -Z with +Y up, so a view
+# direction becomes an 'XYZ' euler (pitch on x, heading on z).
+def look_rotation(direction):
+    x, y, z = np.asarray(direction, dtype=np.float64) / np.linalg.norm(direction)
+    return np.array([math.acos(min(1.0, max(-1.0, -z))), 0.0, math.atan2(-x, y)])
+
+# WindowPoints -> (location, rotation, is living room) in blender space.
+# The camera stands on Eye and looks away from Window, into the room.
+def window_views(window_points, matrix):
+    views = []
+    for point in window_points:
+        window, eye = transform_points(matrix, to_array([point["Window"], point["Eye"]], ("x", "y", "z"), decimals=4))
+        if np.allclose(window, eye):
+            continue
+        views.append((eye, look_rotation(eye - window), bool(point.get("IsLivingRoom"))))
+    return views
+
+#------------------------------------
+# Normals
+def face_normals(co, triangles, normalize=True):
+    corners = co[np.asarray(triangles, dtype=np.int64)].reshape(-1, 3, 3)
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    if normalize:
+        length = np.linalg.norm(normals, axis=1, keepdims=True)
+        normals = np.divide(normals, length, out=np.zeros_like(normals), where=length > 0)
+    return normals
+
+def vertex_normals(co, triangles):
+    # corner angle weighted like blender
+    loops = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+    corners = co[loops]
+    normals = face_normals(co, triangles)
+
+    weights = np.zeros(loops.shape)
+    for i in range(3):
+        a = corners[:, (i + 1) % 3] - corners[:, i]
+        b = corners[:, (i + 2) % 3] - corners[:, i]
+        la = np.linalg.norm(a, axis=1)
+        lb = np.linalg.norm(b, axis=1)
+        cos = np.einsum('ij,ij->i', a, b) / np.maximum(la * lb, 1e-12)
+        weights[:, i] = np.arccos(np.clip(cos, -1, 1))
+
+    result = np.zeros((len(co), 3))
+    for i in range(3):
+        np.add.at(result, loops[:, i], normals * weights[:, i:i+1])
+    length = np.linalg.norm(result, axis=1, keepdims=True)
+    return np.divide(result, length, out=np.zeros_like(result), where=length > 0)
+
+#------------------------------------
+# Solidify. Same result as the blender modifier in simple mode with
+# offset -1 : the input surface stays, a second shell is moved by
+# -thickness along the vertex normals and boundary edges get rim quads
+# (two triangles each). Faces are wound so the solid points outwards.
+def boundary_edges(triangles):
+    loops = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+    edges = np.concatenate([loops[:, [0, 1]], loops[:, [1, 2]], loops[:, [2, 0]]])
+    keys = np.sort(edges, axis=1)
+    _, inverse, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+    return edges[counts[inverse.ravel()] == 1]
+
+def solidify(co, triangles, thickness):
+    loops = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+    count = len(co)
+
+    shell = co - vertex_normals(co, loops) * thickness
+    new_co = np.concatenate([co, shell])
+
+    front = loops
+    back = loops[:, ::-1] + count
+    edges = boundary_edges(loops)
+    a, b = edges[:, 0], edges[:, 1]
+    rims = np.concatenate([np.stack([a, a + count, b + count], axis=1),
+                           np.stack([a, b + count, b], axis=1)])
+
+    if thickness < 0:
+        front = loops[:, ::-1]
+        back = loops + count
+        rims = rims[:, ::-1]
+
+    new_triangles = np.concatenate([front, back, rims]).astype(np.int32).ravel()
+    return new_co, new_triangles
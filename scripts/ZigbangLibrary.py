@@ -60,65 +60,16 @@ class ADDONNAME_OT_clear(bpy.types.Operator):
         return {"FINISHED"}
 
 #------------------------------------
-# calculate bound box
+# calculate bound box. world space boxes of all mesh objects in one batch,
+# rows of mins / maxs follow the returned object list (ZigbangGeometry)
 
-from mathutils import Vector
-from functools import reduce
-from itertools import product
 
-def merge_boxes(objects):
-    return reduce(lambda x, y: x + y,
-        [Box(obj) for obj in objects if obj.type == 'MESH'])
-
-class Box:
-    def __init__(self, bl_object=None, max_min=None):
-        if bl_object and bl_object.type == 'MESH':
-            self.__bound_box = self.__get_bound_box_from_object(bl_object)
-        elif max_min:
-            self.__bound_box = self.__get_bound_box_from_max_min(max_min)
-        else:
-            raise TypeError()
-
-    def __add__(self, bound_box):
-        return self.merge(bound_box)
-
-    def __getitem__(self, index):
-        return self.__bound_box[index]
-
-    @property
-    def max(self):
-        return Vector(max((v.x, v.y, v.z) for v in self.__bound_box))
-
-    @property
-    def min(self):
-        return Vector(min((v.x, v.y, v.z) for v in self.__bound_box))
-
-    @property
-    def center(self):
-        return sum((v for v in self.__bound_box), Vector()) / 8
-
-    def merge(self, box):
-        if not box:
-            return self
-
-        if not isinstance(box, Box):
-            raise TypeError('Require a Box object')
-
-        max_new = Vector(map(max, zip(self.max, box.max)))
-        min_new = Vector(map(min, zip(self.min, box.min)))
-
-        return Box(max_min = (max_new, min_new))
-
-    def __get_bound_box_from_object(self, bl_object):
-        return [bl_object.matrix_world @ Vector(v) \
-                for v in bl_object.bound_box]
-
-    def __get_bound_box_from_max_min(self, max_min):
-        max_point, min_point = max_min
-
-        return [Vector(v) for v in product((max_point.x, min_point.x),
-                                           (max_point.y, min_point.y),
-                                           (max_point.z, min_point.z))]
+def mesh_bounds(objects):
+    meshes = [obj for obj in objects if obj.type == 'MESH']
+    corners = np.array([obj.bound_box for obj in meshes], dtype=np.float64).reshape(-1, 8, 3)
+    matrices = np.array([obj.matrix_world for obj in meshes], dtype=np.float64).reshape(-1, 4, 4)
+    mins, maxs = ZigbangGeometry.object_bounds(corners, matrices)
+    return meshes, mins, maxs
 
 
 #------------------------------------
@@ -128,7 +79,14 @@ import math
 import bmesh
 import glob
 import os
+import sys
 import uuid
+import numpy as np
+
+# ZigbangGeometry sits next to this file in scripts/. not "//scripts", that
+# depends on the open .blend and there is none when the add-on registers
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import ZigbangGeometry
 
 class ADDONNAME_OT_generate(bpy.types.Operator):
     bl_label = "Read XML"
@@ -177,33 +135,18 @@ class ADDONNAME_OT_generate(bpy.types.Operator):
                  name = furniture["name"]
                  type = furniture["type"]
                 
-                 position = furniture["position"]
-                 px = round(position["x"], 2)
-                 py = round(position["y"], 2) + 0.1
-                 pz = round(position["z"], 2)
-                
-                 rotation = furniture["rotation"]
-                 rx = math.radians(round(rotation["x"]))
-                 ry = math.radians(round(rotation["y"]))
-                 rz = math.radians(round(rotation["z"]))
-                
-                 scale = furniture["scale"]
-                 sx = round(scale["x"], 2)
-                 sy = round(scale["y"], 2)
-                 sz = round(scale["z"], 2)
-                                 
                  bpy.ops.wm.append(filepath = os.path.join(source_path, "Object", name), directory=os.path.join(source_path, "Object"), filename=name)
-                 if bpy.data.objects.get(name):
+                 found = bpy.data.objects.get(name) is not None
+                 if found:
                      obj = bpy.data.objects[name]
-                     obj.location = (px, py, pz)
-                     obj.rotation_euler = (rx, ry, rz)
-                     obj.scale = (sx, sy, sz)
                  else:
                      bpy.ops.mesh.primitive_cube_add()
                      obj = bpy.context.object
-                     obj.location = (px, py + sy/2, pz)
-                     obj.rotation_euler = (rx, ry, rz)
-                     obj.scale = (sx/2, sy/2, sz/2)
+
+                 location, rotation, scale = ZigbangGeometry.furniture_placement(furniture, found)
+                 obj.location = location
+                 obj.rotation_euler = rotation
+                 obj.scale = scale
                      
                  obj.name = "{}_{}".format(name, uuid.uuid1())
                 
@@ -222,32 +165,18 @@ class ADDONNAME_OT_generate(bpy.types.Operator):
                  #if "Roof" in name:
                   #   continue
                 
-                 vertices = data["vertices"]
-                 verts = []
-                 for v in vertices:
-                     vx = round(v["x"], 2)
-                     vy = round(v["y"], 2)
-                     vz = round(v["z"], 2)
-                     verts.append((vx, vy, vz))
-                
-                 triangles = data["triangles"]
-                
-                 edges = []
-                 faces = []
-                 for i in range(0, len(triangles), 3):
-                     faces.append(triangles[i:i+3])
-                
-                 uv_datas = data["uv"]
-                 uvs = []
-                 for uv in uv_datas:
-                     ux = round(uv["x"],2)
-                     uy = round(uv["y"],2)
-                     uvs.append([ux, uy])
+                 verts = ZigbangGeometry.to_array(data["vertices"], ("x", "y", "z"))
+                 uvs = ZigbangGeometry.to_array(data["uv"], ("x", "y"))
+                 faces = ZigbangGeometry.to_triangles(data["triangles"]).reshape(-1, 3)
+                 
+                 # roofs and edge strips are thickened on the arrays
+                 offset, thickness = ZigbangGeometry.frame_offset(name)
+                 co, loops = verts, faces
+                 if thickness is not None and len(faces):
+                     co, loops = ZigbangGeometry.solidify(verts, faces, thickness)
                  
                  mesh = bpy.data.meshes.new(name)  
-                 mesh.from_pydata(verts, edges, faces)
-                 mesh.calc_loop_triangles()
-                 mesh.calc_normals_split()
+                 mesh.from_pydata(co.tolist(), [], loops.reshape(-1, 3).tolist())
                  mesh.update(calc_edges=True)
                  
                  
@@ -261,115 +190,29 @@ class ADDONNAME_OT_generate(bpy.types.Operator):
                  
                  obj.name = "{}_{}".format(obj.name,uuid.uuid1())
                  
-                 if name.startswith("Floor_"):
-                     collection_frame.objects.link(obj)
-                     if "Roof" in name:
-                         bpy.context.view_layer.objects.active = obj
-                         obj.select_set(True)
-                         obj.location = (0, -0.1, 0)
-                         bpy.ops.object.modifier_add(type='SOLIDIFY')
-                         bpy.context.object.modifiers["Solidify"].thickness = 50
-                         bpy.context.object.modifiers["Solidify"].offset = -1
-                         bpy.ops.object.convert(target='MESH')
-                         obj.select_set(False)
-                     else:
-                         obj.location = (0, 0.1, 0)
-                 else:
-                     collection_frame.objects.link(obj)
-                     if "Edge_Top" in name:
-                         bpy.context.view_layer.objects.active = obj
-                         obj.select_set(True)
-                         obj.location = (0, -0.2, 0)
-                         bpy.ops.object.modifier_add(type='SOLIDIFY')
-                         bpy.context.object.modifiers["Solidify"].thickness = -3
-                         bpy.context.object.modifiers["Solidify"].offset = -1
-                         bpy.ops.object.convert(target='MESH')
-                         obj.select_set(False)
-                         
-                     if "Edge_Bottom" in name:
-                         bpy.context.view_layer.objects.active = obj
-                         obj.select_set(True)
-                         obj.location = (0, -0.1, 0)
-                         bpy.ops.object.modifier_add(type='SOLIDIFY')
-                         bpy.context.object.modifiers["Solidify"].thickness = -3
-                         bpy.context.object.modifiers["Solidify"].offset = -1
-                         bpy.ops.object.convert(target='MESH')
-                         obj.select_set(False)
-                        
-                     #collection_frame.objects.link(obj)
+                 collection_frame.objects.link(obj)
+                 obj.location = (0, offset, 0)
                  
                  #------------------------------------
-                 # Generate UV     
-                 context = bpy.context
-                 scene = context.scene
-                 vl = context.view_layer
-                 vl.objects.active = obj
-                 
-                 obj.select_set(True)
-                 
-                 ob = context.object
+                 # Generate UV. solidified roofs and edges keep an empty layer
                  me = obj.data
+                 uvlayer = me.uv_layers.new(name=obj.name)
+                 me.uv_layers.active = uvlayer
                  
-                 if len(obj.data.uv_layers) == 0:
-                     uvlayer = me.uv_layers.new(name=obj.name)
-                     me.uv_layers.active = uvlayer
-                     for tri in me.loop_triangles:
-                         if obj.name.startswith("Wall"):
-                             if "Bathroom" in obj.name or "Gate" in obj.name or "Balcony" in obj.name:
-                                 obj.location = (0, 1, 0)
-                                 for i in range(3):
-                                    vert_index = tri.vertices[i]
-                                    loop_index = tri.loops[i]
-                                    uvlayer.data[loop_index].uv = (uvs[vert_index][0], uvs[vert_index][1])
-                             else:
-                                 new_uvs = []
-                                 for i in range(3):
-                                     vert_index = tri.vertices[i]
-                                     vert = verts[vert_index]
-                                     new_uv = [0, 0]
-                                     if vert[1] == 0:
-                                         new_uv[1] = 0
-                                     else:
-                                         new_uv[1] = vert[1]/240;
-                                     new_uvs.append(new_uv)
-
-                                 vert1 = verts[tri.vertices[0]]
-                                 vert2 = verts[tri.vertices[1]]
-                                 vert3 = verts[tri.vertices[2]]
-                                 
-                                 a = vert1[0] - vert2[0]
-                                 b = vert1[2] - vert2[2]
-                                 ver1to2_len = round(math.sqrt((a * a) + (b * b)))
-                                 
-                                 a = vert1[0] - vert3[0]
-                                 b = vert1[2] - vert3[2]
-                                 ver1to3_len = round(math.sqrt((a * a) + (b * b)))
-                                 
-                                 a = vert2[0] - vert3[0]
-                                 b = vert2[2] - vert3[2]
-                                 ver2to3_len = round(math.sqrt((a * a) + (b * b)))
-                                 
-                                 new_uvs[1][0] = ver1to2_len / 240
-                                 new_uvs[2][0] = ver1to3_len / 240
-                                 
-                                 for i in range(3):
-                                     loop_index = tri.loops[i]
-                                     uvlayer.data[loop_index].uv = (new_uvs[i][0], new_uvs[i][1])
-                                 
-                         elif len(uvs) != 0:
-                             for i in range(3):
-                                 vert_index = tri.vertices[i]
-                                 loop_index = tri.loops[i]
-                                 uvlayer.data[loop_index].uv = (uvs[vert_index][0], uvs[vert_index][1])
+                 if thickness is None:
+                     loop_uvs = ZigbangGeometry.frame_uvs(name, verts, faces.ravel(), uvs, tile_height=True)
+                     if loop_uvs is not None:
+                         uvlayer.data.foreach_set("uv", loop_uvs.astype(np.float32).ravel())
              
              #------------------------------------
              # Center Positioning
              bpy.ops.object.select_all(action='SELECT')
              obj.select_set(True)
+             bpy.context.view_layer.update()
             
-             bounds = merge_boxes(bpy.data.objects);
-             center = bounds.center
-             bpy.ops.transform.translate(value = (-center[0], 2, -center[2]))
+             meshes, mins, maxs = mesh_bounds(bpy.data.objects)
+             offset = ZigbangGeometry.center_offset(*ZigbangGeometry.merge_bounds(mins, maxs), lift=2)
+             bpy.ops.transform.translate(value = tuple(offset))
              bpy.ops.object.transform_apply(location = True, rotation=True, scale=True)
              
              obj.select_set(False)
@@ -389,13 +232,15 @@ class ADDONNAME_OT_generate(bpy.types.Operator):
              
              #------------------------------------
              # Genderate Area Light
-             for ob in bpy.data.objects:
+             # the boxes of the centering pass, moved and turned like the room
+             matrix = ZigbangGeometry.Y_UP_ROTATION @ ZigbangGeometry.translation(offset)
+             mins, maxs = ZigbangGeometry.transform_bounds(matrix, mins, maxs)
+             for ob, low, high in zip(meshes, mins, maxs):
                  if ob.name.startswith("Floor") and not "Roof" in ob.name:
-                    bounds = Box(ob)
-                    center = bounds.center
-                    size = bounds.max - bounds.min
+                    center = (low + high) / 2
+                    size = high - low
                     
-                    bpy.ops.object.light_add(type='AREA', align='WORLD', location=(center.x, center.y, 200))
+                    bpy.ops.object.light_add(type='AREA', align='WORLD', location=(center[0], center[1], 200))
                     light = bpy.context.object
                     light.name = "Area.{}".format(ob.name)
                     light.data.shape = 'RECTANGLE'
@@ -403,8 +248,8 @@ class ADDONNAME_OT_generate(bpy.types.Operator):
                     light.data.diffuse_factor = 100
                     light.data.specular_factor = 100
                     light.data.volume_factor = 100
-                    light.data.size = size.x
-                    light.data.size_y = size.y
+                    light.data.size = size[0]
+                    light.data.size_y = size[1]
                     collection_light.objects.link(bpy.context.object)
              
              #------------------------------------
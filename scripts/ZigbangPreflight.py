@@ -0,0 +1,218 @@
+#------------------------------------
+# Pre-flight scan. Plain python, no blender.
+#
+#   python scripts/ZigbangPreflight.py [inputs ...] [--workers N] [-o assets/preflight.json]
+#   python scripts/ZigbangBatch.py --manifest assets/preflight.json ...
+#
+# Every input is loaded and checked in a process pool :
+#   errors   : schema (keys, types, triangle indices, uv counts). the batch
+#              driver fails these without starting blender
+#   warnings : furniture and frame material names missing from the library.
+#              blender would put a cube or no material there. --strict makes
+#              them errors
+# and gets a cost estimate from its vertex and furniture counts. The
+# manifest lists the valid inputs largest first, so the batch starts the
+# long rooms first and does not end waiting on one of them.
+#
+# Names are checked against source/library_index.json, written by
+#   blender --background workspace.blend --python scripts/ZigbangExporter.py -- --library-index source/library_index.json
+# Without it only the schema is checked.
+#
+# The cost model is seconds = base + vertex * vertices + furniture * furnitures.
+# --calibrate fits it to status or trace lines of earlier runs (every JSON
+# line with "input" and "seconds").
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import ZigbangBinary
+import ZigbangCache
+import ZigbangGeometry
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COST_MODEL = {"base" : 2.0, "vertex" : 0.0002, "furniture" : 0.05}
+
+KEYS = {"DanjiId" : int, "RoomTypeId" : int, "Level" : int, "Furnitures" : list, "WallAndFloors" : list, "WindowPoints" : list}
+FURNITURE_TYPES = (0, 1, 2)
+
+def library_index_path(root=root_path):
+    return os.path.join(root, "source", "library_index.json")
+
+def load_library(path=None):
+    # {"objects" : set, "materials" : set, "source" : hash of source.blend}, None without an index
+    path = path or library_index_path()
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as file:
+        index = json.load(file)
+    return {"objects" : set(index["objects"]), "materials" : set(index["materials"]), "source" : index.get("source_hash")}
+
+#------------------------------------
+# Checks. Each returns a list of messages.
+def is_point(value, keys):
+    return isinstance(value, dict) and all(isinstance(value.get(k), (int, float)) for k in keys)
+
+def check_schema(floorplan):
+    errors = []
+    for key, kind in KEYS.items():
+        if not isinstance(floorplan.get(key), kind):
+            errors.append("{} : expected {}".format(key, kind.__name__))
+    if errors:
+        return errors
+
+    for i, furniture in enumerate(floorplan["Furnitures"]):
+        if not isinstance(furniture, dict):
+            errors.append("Furnitures[{}] : expected dict".format(i))
+            continue
+        if not isinstance(furniture.get("name"), str):
+            errors.append("Furnitures[{}] : no name".format(i))
+        if furniture.get("type") not in FURNITURE_TYPES:
+            errors.append("Furnitures[{}] : type {!r}".format(i, furniture.get("type")))
+        for key in ("position", "rotation", "scale"):
+            if not is_point(furniture.get(key), "xyz"):
+                errors.append("Furnitures[{}] : bad {}".format(i, key))
+
+    for i, piece in enumerate(floorplan["WallAndFloors"]):
+        if not isinstance(piece, dict):
+            errors.append("WallAndFloors[{}] : expected dict".format(i))
+            continue
+        try:
+            vertices = ZigbangGeometry.to_array(piece["vertices"], ("x", "y", "z"))
+            triangles = np.asarray(piece["triangles"], dtype=np.int64)
+            uvs = ZigbangGeometry.to_array(piece["uv"], ("x", "y"))
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            errors.append("WallAndFloors[{}] : {}: {}".format(i, type(e).__name__, e))
+            continue
+        name = "WallAndFloors[{}] {}".format(i, piece.get("name"))
+        if not isinstance(piece.get("name"), str):
+            errors.append("{} : no name".format(name))
+        if not np.all(np.isfinite(vertices)):
+            errors.append("{} : vertices not finite".format(name))
+        if len(triangles) % 3:
+            errors.append("{} : {} triangle indices".format(name, len(triangles)))
+        if len(triangles) and (triangles.min() < 0 or triangles.max() >= len(vertices)):
+            errors.append("{} : triangle index out of range".format(name))
+        if len(uvs) and len(uvs) != len(vertices):
+            errors.append("{} : {} uvs for {} vertices".format(name, len(uvs), len(vertices)))
+
+    for i, point in enumerate(floorplan["WindowPoints"]):
+        if not isinstance(point, dict) or not is_point(point.get("Window"), "xyz") or not is_point(point.get("Eye"), "xyz"):
+            errors.append("WindowPoints[{}] : bad Window / Eye".format(i))
+    return errors
+
+def check_names(floorplan, library):
+    if library is None:
+        return []
+    missing = sorted({f["name"] for f in floorplan["Furnitures"]} - library["objects"])
+    warnings = ["furniture not in library : {!r}".format(name) for name in missing]
+    missing = sorted({p["name"] for p in floorplan["WallAndFloors"]} - library["materials"])
+    warnings += ["material not in library : {!r}".format(name) for name in missing]
+    return warnings
+
+def estimate(vertices, furnitures, model=COST_MODEL):
+    return model["base"] + model["vertex"] * vertices + model["furniture"] * furnitures
+
+#------------------------------------
+# One input
+def scan(file_name, library, model=COST_MODEL, strict=False):
+    start = time.perf_counter()
+    result = {"input" : file_name, "bytes" : os.path.getsize(file_name) if os.path.exists(file_name) else 0}
+    try:
+        floorplan = ZigbangBinary.load(file_name)
+    except Exception as e:
+        return dict(result, errors=["{}: {}".format(type(e).__name__, e)], warnings=[])
+
+    errors = check_schema(floorplan) if isinstance(floorplan, dict) else ["not a floorplan object"]
+    warnings = [] if errors else check_names(floorplan, library)
+    if strict:
+        errors, warnings = errors + warnings, []
+
+    if not errors:
+        vertices = sum(len(p["vertices"]) for p in floorplan["WallAndFloors"])
+        result.update(vertices=vertices, furnitures=len(floorplan["Furnitures"]),
+                      pieces=len(floorplan["WallAndFloors"]),
+                      cost=round(estimate(vertices, len(floorplan["Furnitures"]), model), 3))
+    result.update(errors=errors, warnings=warnings, scan_ms=round((time.perf_counter() - start) * 1000, 2))
+    return result
+
+#------------------------------------
+# Cost model from earlier runs
+def calibrate(line_paths, workers):
+    seconds = {}
+    for path in line_paths:
+        with open(path, 'r') as file:
+            for line in file:
+                line = line.strip()
+                if line:
+                    value = json.loads(line)
+                    if value.get("status") == "ok" and "seconds" in value:
+                        seconds[value["input"]] = value["seconds"]
+
+    file_names = [f for f in seconds if os.path.exists(f)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        scans = [s for s in executor.map(scan, file_names, [None] * len(file_names)) if not s["errors"]]
+    if len(scans) < 3:
+        print("calibrate : {} usable runs, keeping the default model".format(len(scans)))
+        return dict(COST_MODEL)
+
+    a = np.array([[1, s["vertices"], s["furnitures"]] for s in scans], dtype=np.float64)
+    b = np.array([seconds[s["input"]] for s in scans], dtype=np.float64)
+    coefficients = np.maximum(np.linalg.lstsq(a, b, rcond=None)[0], 0)
+    return {"base" : float(coefficients[0]), "vertex" : float(coefficients[1]), "furniture" : float(coefficients[2])}
+
+def main():
+    parser = argparse.ArgumentParser(prog="ZigbangPreflight")
+    parser.add_argument("inputs", nargs="*", help="floorplan .json or .zfp files. default: inputs/*.json")
+    parser.add_argument("-o", "--output", default=os.path.join(root_path, "assets", "preflight.json"), help="job manifest")
+    parser.add_argument("--library-index", default=library_index_path())
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--strict", action="store_true", help="unknown furniture / material names are errors")
+    parser.add_argument("--calibrate", nargs="+", help="status or trace JSON lines of earlier runs to fit the cost model")
+    args = parser.parse_args()
+
+    file_names = args.inputs or glob.glob(os.path.join(root_path, "inputs", "*.json"))
+    file_names = [os.path.abspath(f) for f in file_names]
+
+    library = load_library(args.library_index)
+    if library is None:
+        print("no library index ({}), names are not checked".format(args.library_index))
+    elif library["source"] and library["source"] != ZigbangCache.file_hash(os.path.join(root_path, "source", "source.blend")):
+        print("library index is older than source/source.blend")
+
+    model = calibrate(args.calibrate, args.workers) if args.calibrate else COST_MODEL
+
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        count = len(file_names)
+        results = list(executor.map(scan, file_names, [library] * count, [model] * count, [args.strict] * count,
+                                    chunksize=max(1, count // (args.workers * 4))))
+
+    jobs = sorted([r for r in results if not r["errors"]], key=lambda r: -r["cost"])
+    invalid = [r for r in results if r["errors"]]
+    manifest = {"created" : time.time(), "model" : model, "seconds" : round(time.time() - start, 3),
+                "estimated" : round(sum(r["cost"] for r in jobs), 3), "jobs" : jobs, "invalid" : invalid}
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as file:
+        json.dump(manifest, file, indent=2, ensure_ascii=False)
+
+    for r in jobs:
+        print("{:>9.1f}s  {:>8} v {:>4} f  {}{}".format(r["cost"], r["vertices"], r["furnitures"], os.path.relpath(r["input"], root_path),
+                                                    "".join("\n           warning : " + w for w in r["warnings"])))
+    for r in invalid:
+        print("invalid    {}{}".format(os.path.relpath(r["input"], root_path), "".join("\n           " + e for e in r["errors"][:10])))
+    print("------------------------------------")
+    print("{} jobs ({:.0f}s estimated)  {} invalid  {:.2f}s  manifest : {}".format(
+        len(jobs), manifest["estimated"], len(invalid), manifest["seconds"], args.output))
+    return 1 if invalid else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
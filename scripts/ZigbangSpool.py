@@ -0,0 +1,189 @@
+#------------------------------------
+# Job spool for resident exporter workers. No bpy here.
+#
+#   blender --background workspace.blend --python scripts/ZigbangExporter.py -- --watch assets/spool
+#   python scripts/ZigbangSpool.py submit [--wait] [--force] [--render workbench] inputs ...
+#   python scripts/ZigbangSpool.py stop
+#   python scripts/ZigbangSpool.py resume
+#
+# A worker loads workspace.blend, the add-on and the source library once and
+# then takes job after job, so a single room costs its own export and nothing
+# else.
+#
+#   <spool>/queue/<id>.json        {"id", "inputs" : [...], "options" : {...}, "submitted"}
+#   <spool>/work/<id>.<pid>.json   claimed by the worker with that pid
+#   <spool>/done/<id>.json         the job plus "results", one status line per input
+#   <spool>/stop                   workers exit after their current job and
+#                                  do not start until resume removes it
+#
+# Files only move with os.replace / os.rename, so every job is claimed by
+# exactly one worker and readers never see half a file. Jobs of a worker
+# that died go back to the queue when the next worker starts.
+
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+
+import ZigbangConfig
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# exporter options a job may set, everything else comes from the worker
+JOB_OPTIONS = ("force", "output", "quality", "lods", "merge_frame", "atlas", "profile", "render")
+
+def spool_path(root=root_path):
+    return os.path.join(root, "assets", "spool")
+
+def folder(spool, name):
+    path = os.path.join(spool, name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def write_json(path, value):
+    temp = "{}.{}.tmp".format(path, os.getpid())
+    with open(temp, 'w') as file:
+        json.dump(value, file, indent=2, ensure_ascii=False)
+    os.replace(temp, path)
+
+def read_json(path):
+    with open(path, 'r') as file:
+        return json.load(file)
+
+#------------------------------------
+# Jobs. ids sort in submit order.
+def submit(spool, inputs, options=None):
+    unknown = set(options or {}) - set(JOB_OPTIONS)
+    if unknown:
+        raise ValueError("unknown job options : {}".format(", ".join(sorted(unknown))))
+
+    job_id = "{:020d}-{}".format(time.time_ns(), uuid.uuid4().hex[:8])
+    job = {"id" : job_id, "inputs" : [os.path.abspath(f) for f in inputs], "options" : options or {}, "submitted" : time.time()}
+    write_json(os.path.join(folder(spool, "queue"), job_id + ".json"), job)
+    return job_id
+
+def claim(spool):
+    queue, work = folder(spool, "queue"), folder(spool, "work")
+    for name in sorted(os.listdir(queue)):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(work, "{}.{}.json".format(name[:-5], os.getpid()))
+        try:
+            os.rename(os.path.join(queue, name), path)
+        except FileNotFoundError:
+            # another worker was faster
+            continue
+        job = read_json(path)
+        job["claimed"] = time.time()
+        job["work_path"] = path
+        return job
+    return None
+
+def complete(spool, job, results):
+    work_path = job.pop("work_path")
+    job.update(results=results, completed=time.time())
+    write_json(os.path.join(folder(spool, "done"), job["id"] + ".json"), job)
+    os.remove(work_path)
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def recover(spool):
+    # claimed jobs of dead workers go back to the queue
+    queue, work = folder(spool, "queue"), folder(spool, "work")
+    recovered = []
+    for name in os.listdir(work):
+        if name.count(".") != 2:
+            continue
+        job_id, pid, ext = name.split(".")
+        if ext == "json" and pid.isdigit() and not is_alive(int(pid)):
+            os.replace(os.path.join(work, name), os.path.join(queue, job_id + ".json"))
+            recovered.append(job_id)
+    return recovered
+
+def result(spool, job_id):
+    path = os.path.join(folder(spool, "done"), job_id + ".json")
+    return read_json(path) if os.path.exists(path) else None
+
+def wait(spool, job_id, timeout=None, poll=0.1):
+    start = time.time()
+    while timeout is None or time.time() - start < timeout:
+        done = result(spool, job_id)
+        if done is not None:
+            return done
+        time.sleep(poll)
+    return None
+
+#------------------------------------
+# Stop
+def stop_path(spool):
+    return os.path.join(spool, "stop")
+
+def stop(spool):
+    os.makedirs(spool, exist_ok=True)
+    open(stop_path(spool), 'w').close()
+
+def stopped(spool):
+    return os.path.exists(stop_path(spool))
+
+def resume(spool):
+    if stopped(spool):
+        os.remove(stop_path(spool))
+
+def main():
+    parser = argparse.ArgumentParser(prog="ZigbangSpool")
+    parser.add_argument("command", choices=["submit", "stop", "resume", "status"])
+    parser.add_argument("inputs", nargs="*", help="floorplan .json or .zfp files, for submit")
+    parser.add_argument("--spool", default=spool_path())
+    parser.add_argument("--wait", action="store_true", help="wait for the job and print its results")
+    parser.add_argument("--timeout", type=float, help="seconds to wait")
+    parser.add_argument("--force", action="store_true")
+    parser.add_argument("--output")
+    parser.add_argument("--quality", choices=list(ZigbangConfig.TEXTURE_TIERS))
+    parser.add_argument("--lods", type=int)
+    parser.add_argument("--merge-frame", action="store_true")
+    parser.add_argument("--atlas", action="store_true")
+    parser.add_argument("--profile", choices=list(ZigbangConfig.load_profiles()))
+    parser.add_argument("--render", choices=list(ZigbangConfig.RENDER_PRESETS))
+    args = parser.parse_intermixed_args()
+
+    if args.command == "stop":
+        stop(args.spool)
+        return 0
+
+    if args.command == "resume":
+        resume(args.spool)
+        return 0
+
+    if args.command == "status":
+        for name in ("queue", "work", "done"):
+            print("{:<6} {}".format(name, len([f for f in os.listdir(folder(args.spool, name)) if f.endswith(".json")])))
+        return 0
+
+    if not args.inputs:
+        parser.error("submit needs inputs")
+    # only what was given, the worker defaults cover the rest
+    options = {key : getattr(args, key) for key in JOB_OPTIONS if getattr(args, key) not in (None, False)}
+    job_id = submit(args.spool, args.inputs, options)
+    print(job_id)
+    if not args.wait:
+        return 0
+
+    done = wait(args.spool, job_id, args.timeout)
+    if done is None:
+        print("timeout : {}".format(job_id))
+        return 1
+    for line in done["results"]:
+        print(json.dumps(line))
+    return 1 if any(r["status"] == "failed" for r in done["results"]) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
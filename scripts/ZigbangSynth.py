@@ -0,0 +1,160 @@
+#------------------------------------
+# Synthetic floorplans for scaling benchmarks. Same schema as the unity
+# export in inputs/ : DanjiId / RoomTypeId / Level, Furnitures, WallAndFloors
+# and WindowPoints.
+#
+#   python scripts/ZigbangSynth.py --rooms 20 --furniture 200 --vertices 50000 [-o inputs/synth]
+#
+# Rooms are 400 x 300 boxes on a grid. Every room has a floor, a roof, a wall
+# strip, edge strips and a window point; floors, roofs and walls are
+# subdivided until the whole plan has about --vertices vertices. Furniture
+# uses the names of source.blend and stands inside a random room.
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROOM_WIDTH = 400
+ROOM_DEPTH = 300
+ROOM_HEIGHT = 240
+ROOM_TYPES = ["Room", "Livingroom", "Bathroom", "Balcony", "Gate"]
+
+# name -> (type, scale)
+FURNITURES = {
+    "Bed Poliform Java N240218" : (0, (160, 40, 210)),
+    "Sofa" : (0, (200, 80, 90)),
+    "Table" : (0, (120, 75, 80)),
+    "Chair" : (0, (45, 90, 50)),
+    "TV stand" : (0, (180, 50, 40)),
+    "Chest" : (0, (80, 100, 50)),
+    "Bath" : (0, (174, 65, 64)),
+    "Washbasin" : (0, (60, 85, 45)),
+    "Toilets unit" : (0, (40, 80, 70)),
+    "Window" : (1, (120, 120, 10)),
+    "Double French window" : (1, (180, 220, 10)),
+    "Door" : (2, (90, 210, 10)),
+}
+
+def point(p):
+    return {"x" : float(p[0]), "y" : float(p[1]), "z" : float(p[2])}
+
+def uv(p):
+    return {"x" : float(p[0]), "y" : float(p[1])}
+
+#------------------------------------
+# Pieces. A (steps + 1)^2 vertex grid spanned by origin + u * a + v * b.
+def grid(origin, a, b, steps):
+    t = np.linspace(0, 1, steps + 1)
+    u, v = np.meshgrid(t, t, indexing='ij')
+    co = np.asarray(origin, dtype=np.float64) + u.reshape(-1, 1) * a + v.reshape(-1, 1) * b
+    quads = (np.arange(steps)[:, None] * (steps + 1) + np.arange(steps)[None, :]).ravel()
+    triangles = np.concatenate([np.stack([quads, quads + steps + 1, quads + 1], axis=1),
+                                np.stack([quads + 1, quads + steps + 1, quads + steps + 2], axis=1)]).ravel()
+    return co, triangles, np.column_stack([u.ravel(), v.ravel()])
+
+def piece(name, co, triangles, uvs=None):
+    return {
+        "name" : name,
+        "vertices" : [point(p) for p in np.round(co, 2)],
+        "triangles" : triangles.astype(int).tolist(),
+        "uv" : [] if uvs is None else [uv(p) for p in uvs],
+    }
+
+def room_pieces(x, z, room_type, steps):
+    width = np.array([ROOM_WIDTH, 0, 0], dtype=np.float64)
+    depth = np.array([0, 0, -ROOM_DEPTH], dtype=np.float64)
+    height = np.array([0, ROOM_HEIGHT, 0], dtype=np.float64)
+    origin = np.array([x, 0, z], dtype=np.float64)
+    pieces = []
+
+    co, triangles, uvs = grid(origin, width, depth, steps)
+    pieces.append(piece("Floor_{}".format(room_type), co, triangles, uvs * [ROOM_WIDTH / 100, ROOM_DEPTH / 100]))
+    pieces.append(piece("Floor_{}_Roof".format(room_type), co + height, triangles))
+
+    # four walls as one strip around the room
+    wall = "Wall_Bathroom" if room_type == "Bathroom" else "Wall"
+    corners = [origin, origin + width, origin + width + depth, origin + depth, origin]
+    for start, end in zip(corners[:-1], corners[1:]):
+        co, triangles, uvs = grid(start, end - start, height, steps)
+        pieces.append(piece(wall, co, triangles, uvs if wall != "Wall" else None))
+
+    for name, y, strip in (("Edge_Bottom", 0, 2), ("Edge_Top", ROOM_HEIGHT, 2)):
+        co, triangles, uvs = grid(origin + [0, y, 0], width, [0, 0, -strip], 1)
+        pieces.append(piece(name, co, triangles))
+    return pieces
+
+#------------------------------------
+# Floorplan
+def floorplan(rooms=4, furniture=20, vertices=5000, seed=0, danji_id=90000, room_type_id=90000, level=0):
+    rng = np.random.default_rng(seed)
+    columns = max(1, int(np.ceil(np.sqrt(rooms))))
+
+    # floor, roof and four walls are grids of (steps + 1)^2 vertices
+    steps = max(1, int(round(np.sqrt(max(vertices, 1) / (rooms * 6)))) - 1)
+
+    wall_and_floors = []
+    window_points = []
+    origins = []
+    for i in range(rooms):
+        x = (i % columns) * ROOM_WIDTH
+        z = -(i // columns) * ROOM_DEPTH
+        origins.append((x, z))
+        wall_and_floors += room_pieces(x, z, ROOM_TYPES[i % len(ROOM_TYPES)], steps)
+
+        window = np.array([x + ROOM_WIDTH / 2, 149.5, z])
+        window_points.append({"Name" : "", "Window" : point(window), "Eye" : point(window - [0, 0, 1]),
+                              "IsLivingRoom" : ROOM_TYPES[i % len(ROOM_TYPES)] == "Livingroom"})
+
+    names = list(FURNITURES)
+    furnitures = []
+    for i in range(furniture):
+        name = names[rng.integers(len(names))]
+        type, scale = FURNITURES[name]
+        x, z = origins[rng.integers(rooms)]
+        furnitures.append({
+            "name" : name,
+            "position" : point((x + rng.uniform(50, ROOM_WIDTH - 50), 0, z - rng.uniform(50, ROOM_DEPTH - 50))),
+            "rotation" : point((0, 90 * rng.integers(4), 0)),
+            "scale" : point(scale),
+            "type" : type,
+        })
+
+    return {
+        "DanjiId" : danji_id,
+        "RoomTypeId" : room_type_id,
+        "Level" : level,
+        "Furnitures" : furnitures,
+        "WallAndFloors" : wall_and_floors,
+        "WindowPoints" : window_points,
+    }
+
+def write(floorplan, file_path):
+    with open(file_path, 'w') as file:
+        json.dump(floorplan, file, ensure_ascii=False)
+    return file_path
+
+def main():
+    parser = argparse.ArgumentParser(prog="ZigbangSynth")
+    parser.add_argument("--rooms", type=int, default=4)
+    parser.add_argument("--furniture", type=int, default=20)
+    parser.add_argument("--vertices", type=int, default=5000, help="about this many frame vertices")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output-dir", default=os.path.join(root_path, "inputs", "synth"))
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    plan = floorplan(args.rooms, args.furniture, args.vertices, args.seed)
+    file_path = os.path.join(args.output_dir, "synth_r{}_f{}_v{}.json".format(args.rooms, args.furniture, args.vertices))
+    write(plan, file_path)
+
+    count = sum(len(p["vertices"]) for p in plan["WallAndFloors"])
+    print("{} : {} rooms, {} furniture, {} vertices".format(file_path, args.rooms, args.furniture, count))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
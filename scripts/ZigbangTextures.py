@@ -0,0 +1,212 @@
+#------------------------------------
+# Content addressed textures. Every source image is encoded once to
+# assets/textures/<key>.jpg, where key hashes the source bytes, the output
+# format and the variant size. Every glTF refers to that file by uri, so an
+# image that did not change is never encoded again, whatever room or worker
+# needs it.
+#
+#   assets/textures/index.json : source image (relative to the repo) -> output
+#                                and its downscaled variants
+#
+# Variants for the quality tiers of ZigbangConfig.TEXTURE_TIERS can be built
+# ahead of time in a process pool (needs Pillow) :
+#
+#   python scripts/ZigbangTextures.py [--tiers high medium low] [--workers N] [images ...]
+#
+# The blender exporter encodes with bpy (see publish_textures in
+# ZigbangExporter.py). Plain python (ZigbangGLTF.py) encodes with Pillow when
+# it is installed and falls back to the source file otherwise.
+
+import argparse
+import fcntl
+import glob
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import ZigbangCache
+import ZigbangConfig
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMAGE_FORMAT = "JPEG"
+EXTENSIONS = {"JPEG" : ".jpg", "PNG" : ".png"}
+QUALITY = 90
+
+def texture_dir(root=root_path):
+    return os.path.join(root, "assets", "textures")
+
+def index_path(root=root_path):
+    return os.path.join(texture_dir(root), "index.json")
+
+#------------------------------------
+# Keys. file backed images hash their file, generated ones their pixels.
+def content_key(source_path=None, data=None, image_format=IMAGE_FORMAT, size=None):
+    digest = ZigbangCache.file_hash(source_path) if source_path else None
+    if digest is None:
+        if data is None:
+            return None
+        digest = hashlib.sha256(data).hexdigest()
+    key = "{}:{}:{}".format(digest, image_format, QUALITY)
+    if size:
+        key += ":{}".format(size)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+def output_path(key, image_format=IMAGE_FORMAT, root=root_path):
+    return os.path.join(texture_dir(root), key + EXTENSIONS[image_format])
+
+def temp_path(path):
+    # keeps the extension, encoders pick the format from it
+    stem, ext = os.path.splitext(path)
+    return "{}.{}.tmp{}".format(stem, os.getpid(), ext)
+
+#------------------------------------
+# Variants. The longest side goes down to size, smaller images stay as they
+# are. Normal maps are filtered as vectors and renormalized afterwards,
+# averaging the encoded colors would shorten them.
+def target_size(width, height, size):
+    if not size or max(width, height) <= size:
+        return None
+    scale = size / max(width, height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+def is_normal_map(path):
+    stem = os.path.splitext(os.path.basename(path))[0].lower()
+    return stem.endswith("_n") or "normal" in stem
+
+def renormalize(rgb):
+    # encoded 0..1 colors in, encoded unit vectors out
+    normals = rgb * 2 - 1
+    length = np.linalg.norm(normals, axis=-1, keepdims=True)
+    flat = np.zeros_like(normals)
+    flat[..., 2] = 1
+    normals = np.divide(normals, length, out=flat, where=length > 1e-6)
+    return (normals + 1) / 2
+
+#------------------------------------
+# Index
+def load_index(root=root_path):
+    try:
+        with open(index_path(root), 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+def update_index(entries, root=root_path):
+    # workers share one index. read, merge and replace under a lock file, or
+    # two workers that read it at the same time drop each other's entries
+    if not entries:
+        return
+    os.makedirs(texture_dir(root), exist_ok=True)
+    path = index_path(root)
+    with open(path + ".lock", 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        index = load_index(root)
+        for name, value in entries.items():
+            current = index.setdefault(name, {})
+            current.setdefault("variants", {}).update(value.get("variants", {}))
+            current.update({k: v for k, v in value.items() if k != "variants"})
+            if not current["variants"]:
+                del current["variants"]
+
+        temp = "{}.{}.tmp".format(path, os.getpid())
+        with open(temp, 'w') as file:
+            json.dump(index, file, indent=2, sort_keys=True, ensure_ascii=False)
+        os.replace(temp, path)
+
+def entry(source, key, path, root=root_path, size=None):
+    name = os.path.relpath(source, root) if os.path.isabs(source) else source
+    value = {"key" : key, "output" : os.path.basename(path)}
+    if size:
+        value = {"variants" : {str(size) : value}}
+    return name.replace(os.sep, "/"), value
+
+def add_entry(entries, source, key, path, root=root_path, size=None):
+    name, value = entry(source, key, path, root, size)
+    current = entries.setdefault(name, {})
+    current.setdefault("variants", {}).update(value.pop("variants", {}))
+    current.update(value)
+
+#------------------------------------
+# Plain python encoding
+def encode_pillow(source_path, path, size=None):
+    from PIL import Image
+
+    with Image.open(source_path) as image:
+        image = image.convert("RGB")
+        scaled = target_size(image.width, image.height, size)
+        if scaled and is_normal_map(source_path):
+            rgb = np.asarray(image, dtype=np.float32) / 255
+            channels = [np.asarray(Image.fromarray(rgb[..., i], "F").resize(scaled, Image.BOX)) for i in range(3)]
+            rgb = renormalize(np.stack(channels, axis=-1))
+            image = Image.fromarray(np.round(rgb * 255).astype(np.uint8), "RGB")
+        elif scaled:
+            image = image.resize(scaled, Image.LANCZOS)
+        image.save(path, IMAGE_FORMAT, quality=QUALITY)
+
+def publish(source_path, entries=None, root=root_path, size=None):
+    # content addressed copy of source_path, the source itself without Pillow
+    key = content_key(source_path, size=size)
+    if key is None:
+        return source_path
+
+    path = output_path(key, root=root)
+    if not os.path.exists(path):
+        try:
+            os.makedirs(texture_dir(root), exist_ok=True)
+            temp = temp_path(path)
+            encode_pillow(source_path, temp, size)
+            os.replace(temp, path)
+        except ImportError:
+            return source_path
+
+    if entries is not None:
+        add_entry(entries, source_path, key, path, root, size)
+    return path
+
+#------------------------------------
+# Offline variants
+def build_variants(source_path, sizes, root=root_path):
+    entries = {}
+    for size in sizes:
+        publish(source_path, entries, root, size)
+    return entries
+
+def main():
+    tiers = [tier for tier, size in ZigbangConfig.TEXTURE_TIERS.items() if size]
+
+    parser = argparse.ArgumentParser(prog="ZigbangTextures")
+    parser.add_argument("inputs", nargs="*", help="images. default: source/textures/*")
+    parser.add_argument("--tiers", nargs="+", choices=list(ZigbangConfig.TEXTURE_TIERS), default=tiers)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    try:
+        import PIL
+    except ImportError:
+        print("ZigbangTextures needs Pillow : pip install Pillow")
+        return 1
+
+    file_names = args.inputs or sorted(glob.glob(os.path.join(root_path, "source", "textures", "*")))
+    file_names = [os.path.abspath(f) for f in file_names]
+    sizes = [ZigbangConfig.TEXTURE_TIERS[tier] for tier in args.tiers]
+
+    entries = {}
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for result in executor.map(build_variants, file_names, [sizes] * len(file_names)):
+            entries.update(result)
+    update_index(entries)
+
+    for name, value in sorted(entries.items()):
+        variants = value.get("variants", {})
+        sizes_kb = ["{} {}KB".format(size, os.path.getsize(os.path.join(texture_dir(), v["output"])) // 1024)
+                    for size, v in sorted(variants.items(), key=lambda item: -int(item[0]))]
+        print("{} : {}".format(name, ", ".join(sizes_kb)))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
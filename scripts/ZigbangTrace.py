@@ -0,0 +1,137 @@
+#------------------------------------
+# Stage timing for the exporter. No bpy here.
+#
+#   ... ZigbangExporter.py -- --trace trace.jsonl [--chrome-trace trace.json]
+#
+# trace.jsonl gets one line per input file, its stages in the order they ran :
+#   {"input": ..., "status": ..., "seconds": ..., "stages": [
+#       {"name": "load", "calls": 1, "ms": 12.3, "memory_mb": 410, "objects": 0, "vertices": 0}, ...]}
+# Stages that run once per frame piece (frame.uv, frame.mesh ...) are summed,
+# calls says how often they ran. --chrome-trace writes every call as a
+# trace event for chrome://tracing or ui.perfetto.dev, in the JSON array
+# format : events are appended after each input and the closing ] is
+# optional, so the trace of a killed process still opens.
+#
+# Stages are marks, not blocks : start() ends the running stage, so the
+# exporter stays a flat script.
+
+import json
+import os
+import sys
+import time
+
+#------------------------------------
+# Resident memory of this process in MB, None where only the peak is known.
+# psutil when installed, /proc on linux, mach task_info on macOS.
+def memory_usage():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1024 / 1024
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm", 'r') as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        pass
+    if sys.platform == "darwin":
+        return mach_resident()
+    return None
+
+def mach_resident():
+    import ctypes
+
+    class TaskBasicInfo(ctypes.Structure):
+        # mach_task_basic_info, <mach/task_info.h>
+        _pack_ = 4
+        _fields_ = [("virtual_size", ctypes.c_uint64), ("resident_size", ctypes.c_uint64),
+                    ("resident_size_max", ctypes.c_uint64), ("user_time", ctypes.c_int32 * 2),
+                    ("system_time", ctypes.c_int32 * 2), ("policy", ctypes.c_int32), ("suspend_count", ctypes.c_int32)]
+
+    try:
+        libc = ctypes.CDLL("/usr/lib/libSystem.B.dylib")
+        info = TaskBasicInfo()
+        count = ctypes.c_uint32(ctypes.sizeof(info) // 4)
+        MACH_TASK_BASIC_INFO = 20
+        task = ctypes.c_uint32.in_dll(libc, "mach_task_self_")
+        if libc.task_info(task, MACH_TASK_BASIC_INFO, ctypes.byref(info), ctypes.byref(count)) != 0:
+            return None
+    except (OSError, ValueError, AttributeError):
+        return None
+    return info.resident_size / 1024 / 1024
+
+# probe, if given, returns more counts for every top-level stage when it
+# ends (the exporter passes datablock memory with --bounded). Per piece
+# stages (frame.uv ...) are not probed, that would walk every datablock
+# once per piece.
+class Trace:
+    def __init__(self, path=None, chrome_path=None, probe=None):
+        self.path = path
+        self.chrome_path = chrome_path
+        self.probe = probe
+        self.origin = time.perf_counter()
+        self.events = []
+        if chrome_path:
+            with open(chrome_path, 'w') as file:
+                file.write("[\n")
+        self.begin(None)
+
+    def begin(self, input_path):
+        self.input = input_path
+        self.stages = {}
+        self.running = None
+
+    def start(self, name):
+        self.stop()
+        self.running = (name, time.perf_counter())
+
+    def count(self, **counts):
+        # attach counts (objects, vertices ...) to the running stage
+        if self.running:
+            self.stages.setdefault(self.running[0], {"name" : self.running[0], "calls" : 0, "ms" : 0.0}).update(counts)
+
+    def stop(self):
+        if not self.running:
+            return
+        name, start = self.running
+        end = time.perf_counter()
+        self.running = None
+
+        stage = self.stages.setdefault(name, {"name" : name, "calls" : 0, "ms" : 0.0})
+        stage["calls"] += 1
+        stage["ms"] += (end - start) * 1000
+        memory = memory_usage()
+        if memory is not None:
+            stage["memory_mb"] = round(memory)
+        if self.probe and "." not in name:
+            stage.update(self.probe())
+
+        if self.chrome_path:
+            self.events.append({
+                "name" : name, "cat" : "stage", "ph" : "X", "pid" : os.getpid(), "tid" : 0,
+                "ts" : round((start - self.origin) * 1e6, 1), "dur" : round((end - start) * 1e6, 1),
+                "args" : {"input" : os.path.basename(self.input or "")}})
+
+    def end(self, result):
+        self.stop()
+        stages = []
+        for stage in self.stages.values():
+            stages.append(dict(stage, ms=round(stage["ms"], 3)))
+
+        if self.path:
+            with open(self.path, 'a') as file:
+                file.write(json.dumps(dict(result, stages=stages)) + "\n")
+        self.flush()
+        self.begin(None)
+        return stages
+
+    def flush(self):
+        if not self.chrome_path or not self.events:
+            return
+        with open(self.chrome_path, 'a') as file:
+            file.write("".join(json.dumps(event) + ",\n" for event in self.events))
+        self.events = []
+
+    def close(self):
+        self.stop()
+        self.flush()